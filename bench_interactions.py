@@ -0,0 +1,121 @@
+"""Per-interaction latency before and after fragment scoping.
+
+Before the page was split into st.fragment regions every widget interaction
+re-executed the whole script; now it re-executes only the fragment that owns
+the widget. This runs both versions as real `streamlit run` workers, the
+current modern_app.py and the pre-fragment one checked out from git, and
+drives each over the browser's websocket protocol (loadtest.BrowserSession):
+every interaction is a genuine widget change, and its latency runs from
+sending it to the worker's script_finished message, fragment reruns included.
+
+    python bench_interactions.py --runs 10
+
+Both workers read the same secrets file, so it must hold the server,
+database, username and password keys the pre-fragment version expects.
+"""
+import argparse
+import datetime as dt
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+from websockets.sync.client import connect
+
+from loadtest import DEBUG_CHECKBOX, MAX_DATE, MIN_DATE, BrowserSession, launch_worker
+
+# Two ranges to alternate between; both are cached after the warm-up pass,
+# so only the rerun itself is measured
+RANGES = [(MIN_DATE, MAX_DATE), (dt.date(2015, 1, 1), dt.date(2015, 12, 31))]
+
+# Interactions an analyst makes, and which region reruns now. Changing
+# dates still reruns the whole script and serves as the control.
+INTERACTIONS = {
+    "toggle debug info":  ("debug_section", lambda browser, i: browser.toggle(DEBUG_CHECKBOX)),
+    "export KPI summary": ("export_section", lambda browser, i: browser.click("📊 Export KPI Summary")),
+    "export trend data":  ("export_section", lambda browser, i: browser.click("📈 Export Trend Data")),
+    "export client data": ("export_section", lambda browser, i: browser.click("🏷️ Export Client Data")),
+    "change date range":  ("full script", lambda browser, i: browser.set_dates(*RANGES[i % 2])),
+}
+
+
+def pre_fragment_rev(app):
+    """The commit just before `app` first used st.fragment."""
+    commits = subprocess.run(
+        ["git", "log", "--reverse", "--format=%H", "-S", "st.fragment", "--", app],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    if not commits:
+        raise SystemExit(f"{app} has no st.fragment in its history; pass --before-rev")
+    return f"{commits[0]}^"
+
+
+def checkout(rev, directory):
+    """Extract the tree at `rev` into `directory`, so the app finds its own modules."""
+    archive = subprocess.run(["git", "archive", rev], capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+
+
+def measure(app, args, workdir):
+    """Median milliseconds per interaction for one version of the app."""
+    worker = launch_worker(app, args.secrets, args.port, workdir)
+    try:
+        url = f"ws://localhost:{args.port}/_stcore/stream"
+        with connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+            browser = BrowserSession(ws, args.timeout)
+            if not browser.rerun():  # cold page load fills the data caches
+                raise SystemExit(f"{app} failed on first load; see {workdir}/worker.log")
+
+            samples = {name: [] for name in INTERACTIONS}
+            for i in range(args.runs + 1):
+                for name, (_, action) in INTERACTIONS.items():
+                    started = time.perf_counter()
+                    if not action(browser, i):
+                        raise SystemExit(f"{app}: {name} failed; see {workdir}/worker.log")
+                    if i:  # the first pass warms the second date range
+                        samples[name].append((time.perf_counter() - started) * 1000)
+    finally:
+        worker.terminate()
+        worker.wait()
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="modern_app.py")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--before-rev",
+                        help="Git revision of the pre-fragment app (default: the commit "
+                             "before modern_app.py first used st.fragment)")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="Seconds to wait for one interaction")
+    args = parser.parse_args()
+
+    rev = args.before_rev or pre_fragment_rev(args.app)
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        before_dir = os.path.join(workdir, "before")
+        os.mkdir(before_dir)
+        checkout(rev, before_dir)
+        before = measure(os.path.join(before_dir, args.app), args, before_dir)
+        after = measure(args.app, args, workdir)
+
+    report = pd.DataFrame([
+        {
+            "interaction": name,
+            "reruns now": region,
+            "before_ms": before[name],
+            "after_ms": after[name],
+        }
+        for name, (region, _) in INTERACTIONS.items()
+    ])
+    report["speedup"] = report["before_ms"] / report["after_ms"]
+    print(f"Median over {args.runs} warm runs per interaction; before = {rev}")
+    print(report.to_string(index=False, float_format="%.1f"))
+
+
+if __name__ == "__main__":
+    main()
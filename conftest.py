@@ -0,0 +1 @@
+"""Lets tests/ import the repo's top-level modules (queries, ...)."""
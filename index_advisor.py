@@ -0,0 +1,261 @@
+"""Workload-driven index advisor for the KPI procedures.
+
+Runs every call load_kpis makes, plus the trend query, against a local
+replica with actual execution plans captured. Missing-index hints and
+full scans in those plans become CREATE INDEX proposals, written as a
+script. With --apply the script (or a reviewed pack such as
+sql/SQLQuery32.sql via --pack) is executed and the workload is timed again.
+
+    python index_advisor.py --url "mssql+pyodbc://..." --out proposals.sql
+    python index_advisor.py --pack sql/SQLQuery32.sql --apply
+"""
+import argparse
+import datetime as dt
+import os
+import re
+import statistics
+import time
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+from queries import proc_sql, kpi_calls, TREND_SQL
+
+NS = {"p": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+
+# Operators that read a whole heap or clustered index instead of an index
+FULL_SCAN_OPS = {"Table Scan", "Clustered Index Scan"}
+
+
+def workload(s, e):
+    """Every statement a dashboard page load sends, as (name, sql, params)."""
+    calls = [
+        (name, proc_sql(proc, params), params)
+        for name, (proc, params) in kpi_calls(s, e).items()
+    ]
+    trend_sql = TREND_SQL.replace(":start", "?").replace(":end", "?")
+    calls.append(("trend", trend_sql, (s, e, s, e)))
+    return calls
+
+
+def execute(cursor, sql, params, capture_plan=False):
+    """Run one statement, drain every result set and return (seconds, plans)."""
+    if capture_plan:
+        cursor.execute("SET STATISTICS XML ON")
+
+    plans = []
+    started = time.perf_counter()
+    cursor.execute(sql, params)
+    while True:
+        if cursor.description:
+            rows = cursor.fetchall()
+            if cursor.description[0][0].endswith("XML Showplan"):
+                plans.extend(row[0] for row in rows)
+        if not cursor.nextset():
+            break
+    elapsed = time.perf_counter() - started
+
+    if capture_plan:
+        cursor.execute("SET STATISTICS XML OFF")
+    return elapsed, plans
+
+
+def run_script(cursor, path):
+    """Execute a .sql file batch by batch, splitting on GO lines."""
+    with open(path, encoding="utf-8-sig") as f:
+        batches = re.split(r"^\s*GO\s*$", f.read(), flags=re.MULTILINE | re.IGNORECASE)
+    for batch in batches:
+        if batch.strip() and not batch.strip().upper().startswith("USE "):
+            cursor.execute(batch)
+            cursor.commit()
+
+
+def _clean(name):
+    return name.strip("[]") if name else name
+
+
+def analyse_plan(xml):
+    """Pull missing-index hints and full scans out of a showplan document."""
+    root = ET.fromstring(xml)
+
+    missing = []
+    for group in root.iterfind(".//p:MissingIndexGroup", NS):
+        impact = float(group.get("Impact", 0))
+        for index in group.iterfind("p:MissingIndex", NS):
+            cols = {"EQUALITY": [], "INEQUALITY": [], "INCLUDE": []}
+            for col_group in index.iterfind("p:ColumnGroup", NS):
+                cols[col_group.get("Usage")] += [
+                    _clean(c.get("Name")) for c in col_group.iterfind("p:Column", NS)
+                ]
+            missing.append({
+                "table": f"{_clean(index.get('Schema'))}.{_clean(index.get('Table'))}",
+                "keys": tuple(cols["EQUALITY"] + cols["INEQUALITY"]),
+                "include": set(cols["INCLUDE"]),
+                "impact": impact,
+            })
+
+    scans = []
+    for op in root.iterfind(".//p:RelOp", NS):
+        if op.get("PhysicalOp") not in FULL_SCAN_OPS:
+            continue
+        obj = op.find("./*/p:Object", NS)
+        if obj is None or obj.get("Schema") is None:
+            continue
+        scans.append({
+            "table": f"{_clean(obj.get('Schema'))}.{_clean(obj.get('Table'))}",
+            "op": op.get("PhysicalOp"),
+            "rows": float(op.get("TableCardinality") or op.get("EstimateRows") or 0),
+            "columns": {
+                _clean(c.get("Column"))
+                for c in op.findall("./p:OutputList/p:ColumnReference", NS)
+            },
+        })
+    return missing, scans
+
+
+def capture(cursor, calls):
+    """Capture plans for the workload and return {name: (missing, scans)}."""
+    analysed = {}
+    for name, sql, params in calls:
+        _, plans = execute(cursor, sql, params, capture_plan=True)
+        missing, scans = [], []
+        for plan in plans:
+            m, sc = analyse_plan(plan)
+            missing += m
+            scans += sc
+        analysed[name] = (missing, scans)
+    return analysed
+
+
+def propose(analysed, columnstore_rows):
+    """Merge plan findings into CREATE INDEX statements with the callers listed."""
+    rowstore = {}
+    for name, (missing, _) in analysed.items():
+        for m in missing:
+            entry = rowstore.setdefault(
+                (m["table"], m["keys"]),
+                {"include": set(), "impact": 0.0, "callers": set()},
+            )
+            entry["include"] |= m["include"] - set(m["keys"])
+            entry["impact"] = max(entry["impact"], m["impact"])
+            entry["callers"].add(name)
+
+    # Large tables still scanned by several KPIs are better served by one
+    # nonclustered columnstore than a covering index per query shape
+    scanned = {}
+    for name, (_, scans) in analysed.items():
+        for sc in scans:
+            if sc["rows"] < columnstore_rows:
+                continue
+            entry = scanned.setdefault(sc["table"], {"columns": set(), "callers": set()})
+            entry["columns"] |= sc["columns"]
+            entry["callers"].add(name)
+
+    statements = []
+    for (table, keys), entry in sorted(rowstore.items(), key=lambda kv: -kv[1]["impact"]):
+        short = table.split(".")[-1]
+        index_name = f"IX_{short}_{'_'.join(keys)}"[:128]
+        include = f"\nINCLUDE({', '.join(sorted(entry['include']))})" if entry["include"] else ""
+        statements.append(
+            f"-- impact {entry['impact']:.0f}%, used by: {', '.join(sorted(entry['callers']))}\n"
+            f"CREATE NONCLUSTERED INDEX {index_name}\n"
+            f"ON {table}({', '.join(keys)}){include};"
+        )
+
+    for table, entry in sorted(scanned.items()):
+        if len(entry["callers"]) < 2 or not entry["columns"]:
+            continue
+        short = table.split(".")[-1]
+        statements.append(
+            f"-- full scans by: {', '.join(sorted(entry['callers']))}\n"
+            f"CREATE NONCLUSTERED COLUMNSTORE INDEX NCCI_{short}\n"
+            f"ON {table}({', '.join(sorted(entry['columns']))});"
+        )
+    return statements
+
+
+def benchmark(cursor, calls, repeat):
+    """Median wall time per workload statement over `repeat` warm runs."""
+    timings = {}
+    for name, sql, params in calls:
+        execute(cursor, sql, params)  # warm the buffer pool and plan cache
+        timings[name] = statistics.median(
+            execute(cursor, sql, params)[0] for _ in range(repeat)
+        )
+    return pd.Series(timings, name="seconds")
+
+
+def unindexed(analysed, min_rows=10_000):
+    """Workload entries whose plans still fully scan a non-trivial table."""
+    found = {}
+    for name, (_, scans) in analysed.items():
+        ops = sorted({f"{sc['op']} on {sc['table']}" for sc in scans if sc["rows"] >= min_rows})
+        if ops:
+            found[name] = ops
+    return found
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("REPLICA_DB_URL"),
+                        help="SQLAlchemy URL of the replica (default: $REPLICA_DB_URL)")
+    parser.add_argument("--start", type=dt.date.fromisoformat, default=dt.date(2013, 1, 1))
+    parser.add_argument("--end", type=dt.date.fromisoformat, default=dt.date(2016, 12, 31))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--columnstore-rows", type=float, default=1_000_000,
+                        help="Scanned-table size above which a columnstore is proposed")
+    parser.add_argument("--out", default="index_proposals.sql")
+    parser.add_argument("--pack", help="Apply this reviewed script instead of the proposals")
+    parser.add_argument("--apply", action="store_true",
+                        help="Execute the indexes and benchmark again")
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("pass --url or set REPLICA_DB_URL")
+
+    sd = dt.datetime.combine(args.start, dt.time.min)
+    ed = dt.datetime.combine(args.end, dt.time.max)
+    calls = workload(sd, ed)
+
+    conn = create_engine(args.url).raw_connection()
+    try:
+        cursor = conn.cursor()
+
+        before = benchmark(cursor, calls, args.repeat)
+        analysed = capture(cursor, calls)
+
+        statements = propose(analysed, args.columnstore_rows)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(statements) + "\nGO\n")
+        print(f"Wrote {len(statements)} proposals to {args.out}")
+
+        if not args.apply:
+            print(before.to_frame().to_string())
+            for name, ops in unindexed(analysed).items():
+                print(f"  {name}: {'; '.join(ops)}")
+            return
+
+        run_script(cursor, args.pack or args.out)
+        after = benchmark(cursor, calls, args.repeat)
+
+        report = pd.DataFrame({"before_s": before, "after_s": after})
+        report["speedup"] = report["before_s"] / report["after_s"]
+        print(report.sort_values("before_s", ascending=False).to_string(float_format="%.3f"))
+        print(f"Total: {before.sum():.2f}s -> {after.sum():.2f}s")
+
+        remaining = unindexed(capture(cursor, calls))
+        if remaining:
+            print("Still without an index-backed plan:")
+            for name, ops in remaining.items():
+                print(f"  {name}: {'; '.join(ops)}")
+        else:
+            print("Every workload statement has an index-backed plan.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Regression harness for the set-based promo procedures.
+
+Seeds a scratch database with a synthetic deals/items/invoice-lines
+dataset, in the dbo tables and in the dw star-schema tables
+(sql/SQLQuery34.sql) the current procedures read, installs those
+procedures (sql/SQLQuery35.sql) next to their _Legacy versions
+(sql/SQLQuery33.sql) and compares both with a pandas reference, over the
+full history and over one date window:
+
+* deal counts and max discount must match legacy exactly;
+* every column of the new procedures must match the reference, including
+  sales and profit, which legacy over-counts once per extra deal in a group;
+* median timings of legacy vs new are printed side by side.
+
+    python promo_regression.py --url "mssql+pyodbc://.../promo_scratch?..."
+
+The target database must not hold real data: the synthetic tables are
+created under their production names because the procedures use them.
+"""
+import argparse
+import datetime as dt
+import os
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, inspect, types
+
+from queries import proc_sql
+
+PROCS = [
+    # (procedure, key columns, columns that must match its _Legacy version,
+    #  whether the _Legacy version takes a date window)
+    ("dbo.usp_KPI_PromoPerformance",
+     ["StockGroupID"],
+     ["ActiveDeals", "MaxDiscountPct"],
+     True),
+    ("dbo.usp_KPI_PromoPerformanceByBuyingGroup",
+     ["BuyingGroupID", "StockGroupID"],
+     ["DealCount"],
+     False),
+]
+
+# dbo tables feed the _Legacy procedures (and the deal side of the new ones)
+TABLES = [
+    "WarehouseStockGroups", "StockItemsStockGroups", "SalesBuyingGroups",
+    "SalesSpecialDeals", "SalesInvoiceLines",
+]
+
+# dw tables the current procedures read, created from SQLQuery34.sql
+DW_TABLES = ["DimStockGroup", "BridgeStockItemGroup", "FactInvoiceLine"]
+
+PROC_SOURCE = "sql/SQLQuery35.sql"
+
+
+def synthetic(items, groups, buying_groups, deals, lines, seed):
+    """Build WideWorldImporters-shaped frames for the tables the procs read."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2013-01-01")
+    days = 4 * 365
+
+    stock_groups = pd.DataFrame({
+        "StockGroupID": np.arange(1, groups + 1),
+        "StockGroupName": [f"Group {i}" for i in range(1, groups + 1)],
+    })
+
+    # Most items sit in one or two groups; a few have no group at all
+    bridge = pd.DataFrame({
+        "StockItemID": rng.integers(1, items + 1, int(items * 1.5)),
+        "StockGroupID": rng.integers(1, groups + 1, int(items * 1.5)),
+    }).drop_duplicates()
+    bridge = bridge[bridge["StockItemID"] % 50 != 0]
+
+    buying = pd.DataFrame({
+        "BuyingGroupID": np.arange(1, buying_groups + 1),
+        "BuyingGroupName": [f"Buying Group {i}" for i in range(1, buying_groups + 1)],
+    })
+
+    # Half item-level, half group-level deals; some tied to a buying group
+    item_level = rng.random(deals) < 0.5
+    deal_start = start + rng.integers(0, days - 30, deals).astype("timedelta64[D]")
+    special = pd.DataFrame({
+        "SpecialDealID": np.arange(1, deals + 1),
+        "StockItemID": np.where(item_level, rng.integers(1, items + 1, deals), np.nan),
+        "StockGroupID": np.where(item_level, np.nan, rng.integers(1, groups + 1, deals)),
+        "BuyingGroupID": np.where(rng.random(deals) < 0.6,
+                                  rng.integers(1, buying_groups + 1, deals), np.nan),
+        "StartDate": deal_start,
+        "EndDate": deal_start + rng.integers(7, 180, deals).astype("timedelta64[D]"),
+        "DiscountPercentage": np.where(rng.random(deals) < 0.9,
+                                       rng.integers(1, 40, deals).astype(float), np.nan),
+    })
+    for col in ["StockItemID", "StockGroupID", "BuyingGroupID"]:
+        special[col] = special[col].astype("Int64")
+
+    price = rng.gamma(2.0, 150.0, lines).round(2)
+    invoice_lines = pd.DataFrame({
+        "InvoiceLineID": np.arange(1, lines + 1),
+        "StockItemID": rng.integers(1, items + 1, lines),
+        "ExtendedPrice": price,
+        "LineProfit": (price * rng.uniform(0.05, 0.45, lines)).round(2),
+        "LastEditedWhen": start + rng.integers(0, days * 86400, lines).astype("timedelta64[s]"),
+    })
+
+    return {
+        "WarehouseStockGroups": stock_groups,
+        "StockItemsStockGroups": bridge,
+        "SalesBuyingGroups": buying,
+        "SalesSpecialDeals": special,
+        "SalesInvoiceLines": invoice_lines,
+    }
+
+
+def dw_frames(frames):
+    """The dw star-schema tables holding the same data as the dbo frames."""
+    lines = frames["SalesInvoiceLines"]
+    fact = lines.assign(
+        InvoiceID=lines["InvoiceLineID"],
+        DateKey=lines["LastEditedWhen"].dt.strftime("%Y%m%d").astype(int),
+        Quantity=1,
+        TaxRate=15.0,
+        TaxAmount=(lines["ExtendedPrice"] * 0.15).round(2),
+    ).sort_values("LastEditedWhen")  # the load orders the columnstore by date
+    return {
+        "DimStockGroup": frames["WarehouseStockGroups"],
+        "BridgeStockItemGroup": frames["StockItemsStockGroups"],
+        "FactInvoiceLine": fact,
+    }
+
+
+def reference(frames, start=None, end=None):
+    """Expected output of the set-based procedures for a date window.
+
+    Without bounds the window is the full history. Like the procedures, a
+    deal counts when it runs at some point inside the window and sales
+    count when LastEditedWhen falls inside it.
+    """
+    deals = frames["SalesSpecialDeals"]
+    bridge = frames["StockItemsStockGroups"]
+    lines = frames["SalesInvoiceLines"]
+    if start is not None:
+        deals = deals[(deals["StartDate"] <= end) & (deals["EndDate"] >= start)]
+        lines = lines[(lines["LastEditedWhen"] >= start) & (lines["LastEditedWhen"] <= end)]
+
+    deal_groups = deals.merge(bridge, on="StockItemID", how="left", suffixes=("_deal", ""))
+    deal_groups["StockGroupID"] = deal_groups["StockGroupID"].fillna(deal_groups["StockGroupID_deal"])
+    deal_groups = deal_groups.dropna(subset=["StockGroupID"]).drop_duplicates(
+        ["SpecialDealID", "StockGroupID"])
+    deal_groups["StockGroupID"] = deal_groups["StockGroupID"].astype(int)
+
+    item_sales = lines.groupby("StockItemID")[["ExtendedPrice", "LineProfit"]].sum()
+    group_sales = (bridge.join(item_sales, on="StockItemID", how="inner")
+                   .groupby("StockGroupID")[["ExtendedPrice", "LineProfit"]].sum()
+                   .rename(columns={"ExtendedPrice": "SalesDuringDeals",
+                                    "LineProfit": "ProfitDuringDeals"}))
+
+    promo = deal_groups.groupby("StockGroupID").agg(
+        ActiveDeals=("SpecialDealID", "count"),
+        AvgDiscountPct=("DiscountPercentage", "mean"),
+        MaxDiscountPct=("DiscountPercentage", "max"),
+    ).join(group_sales).fillna({"SalesDuringDeals": 0, "ProfitDuringDeals": 0}).reset_index()
+
+    by_buying = deal_groups.dropna(subset=["BuyingGroupID"]).astype({"BuyingGroupID": int})
+    by_buying = by_buying.groupby(["BuyingGroupID", "StockGroupID"]).agg(
+        DealCount=("SpecialDealID", "count"),
+        AvgDiscountPct=("DiscountPercentage", "mean"),
+    ).join(group_sales, on="StockGroupID").fillna(
+        {"SalesDuringDeals": 0, "ProfitDuringDeals": 0}).reset_index()
+
+    return {
+        "dbo.usp_KPI_PromoPerformance": promo,
+        "dbo.usp_KPI_PromoPerformanceByBuyingGroup": by_buying,
+    }
+
+
+def script_batches(path):
+    """The GO-separated batches of one of the repo's .sql files."""
+    with open(path, encoding="utf-8-sig") as f:
+        return re.split(r"^\s*GO\s*$", f.read(), flags=re.MULTILINE)
+
+
+def seed_tables(engine, frames):
+    dtypes = {
+        "DiscountPercentage": types.DECIMAL(18, 3),
+        "ExtendedPrice": types.DECIMAL(18, 2),
+        "LineProfit": types.DECIMAL(18, 2),
+        "StockGroupName": types.NVARCHAR(50),
+        "BuyingGroupName": types.NVARCHAR(50),
+    }
+    for name, frame in frames.items():
+        frame.to_sql(name, engine, schema="dbo", index=False, chunksize=10_000,
+                     dtype={c: t for c, t in dtypes.items() if c in frame.columns})
+
+    # The dw tables keep their SQLQuery34.sql definitions (columnstore fact
+    # included) so the timings reflect what production runs
+    batches = script_batches("sql/SQLQuery34.sql")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(next(b for b in batches if "CREATE SCHEMA dw" in b))
+        for name in DW_TABLES:
+            conn.exec_driver_sql(next(b for b in batches if f"CREATE TABLE dw.{name} (" in b))
+    for name, frame in dw_frames(frames).items():
+        frame.to_sql(name, engine, schema="dw", index=False, chunksize=10_000,
+                     if_exists="append")
+
+
+def install_procs(engine):
+    current = script_batches(PROC_SOURCE)
+    batches = [next(b for b in current if f"PROCEDURE {proc}\n" in b) for proc, *_ in PROCS]
+    batches += [b for b in script_batches("sql/SQLQuery33.sql") if "CREATE OR ALTER PROCEDURE" in b]
+    with engine.begin() as conn:
+        for batch in batches:
+            conn.exec_driver_sql(batch)
+
+
+def timed(engine, proc, repeat, params=()):
+    """Run a procedure `repeat` times; return its result and the median seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = pd.read_sql(proc_sql(proc, params), engine, params=params)
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings)
+
+
+def compare(actual, expected, keys, columns):
+    """Rows or columns of `actual` that disagree with `expected`, as a message list."""
+    merged = actual.merge(expected, on=keys, how="outer", suffixes=("", "_exp"), indicator=True)
+    problems = []
+    missing = merged[merged["_merge"] != "both"]
+    if not missing.empty:
+        problems.append(f"{len(missing)} rows present on one side only")
+    both = merged[merged["_merge"] == "both"]
+    for col in columns:
+        got = pd.to_numeric(both[col], errors="coerce").astype(float)
+        exp = pd.to_numeric(both[f"{col}_exp"], errors="coerce").astype(float)
+        bad = ~np.isclose(got, exp, rtol=1e-6, atol=0.01, equal_nan=True)
+        if bad.any():
+            problems.append(f"{col}: {int(bad.sum())} of {len(both)} rows differ")
+    return problems
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("SCRATCH_DB_URL"),
+                        help="SQLAlchemy URL of a scratch database (default: $SCRATCH_DB_URL)")
+    parser.add_argument("--items", type=int, default=2_000)
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--buying-groups", type=int, default=3)
+    parser.add_argument("--deals", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--window", nargs=2, type=dt.date.fromisoformat,
+                        default=[dt.date(2014, 1, 1), dt.date(2014, 12, 31)],
+                        metavar=("START", "END"),
+                        help="Date window checked besides the full history")
+    parser.add_argument("--replace", action="store_true",
+                        help="Drop existing synthetic tables before seeding")
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("pass --url or set SCRATCH_DB_URL")
+
+    engine = create_engine(args.url, fast_executemany=True)
+
+    existing = [f"dbo.{t}" for t in TABLES if inspect(engine).has_table(t, schema="dbo")]
+    existing += [f"dw.{t}" for t in DW_TABLES if inspect(engine).has_table(t, schema="dw")]
+    if existing and not args.replace:
+        sys.exit(f"Refusing to overwrite {', '.join(existing)}; pass --replace on a scratch database")
+    with engine.begin() as conn:
+        for table in existing:
+            conn.exec_driver_sql(f"DROP TABLE {table}")
+
+    frames = synthetic(args.items, args.groups, args.buying_groups,
+                       args.deals, args.lines, args.seed)
+    seed_tables(engine, frames)
+    install_procs(engine)
+
+    # Bound the window the way the app does (sd and ed in modern_app.py):
+    # from the start of its first day to the end of its last, so sales
+    # edited during the last day count; the reference cuts at the same points
+    start = dt.datetime.combine(args.window[0], dt.time.min)
+    end = dt.datetime.combine(args.window[1], dt.time.max)
+    cases = [("full history", (), reference(frames)),
+             (f"{args.window[0]} to {args.window[1]}", (start, end),
+              reference(frames, pd.Timestamp(start), pd.Timestamp(end)))]
+
+    failures = 0
+    for label, params, expected in cases:
+        for proc, keys, legacy_cols, legacy_windowed in PROCS:
+            new, new_s = timed(engine, proc, args.repeat, params)
+            ref = expected[proc]
+            new_problems = compare(new, ref, keys, [c for c in ref.columns if c not in keys])
+
+            print(f"{proc} ({label})")
+            if params and not legacy_windowed:
+                # Nothing to time or check against; the reference still applies
+                print(f"  new {new_s:.3f}s  (legacy takes no window)")
+                print(f"  vs reference: {'; '.join(new_problems) or 'OK'}")
+                failures += bool(new_problems)
+                continue
+
+            old, old_s = timed(engine, f"{proc}_Legacy", args.repeat, params)
+            legacy_problems = compare(new, old, keys, legacy_cols)
+            drift = compare(old, ref, keys, ["SalesDuringDeals", "ProfitDuringDeals"])
+
+            print(f"  legacy {old_s:.3f}s  new {new_s:.3f}s  speedup {old_s / new_s:.1f}x")
+            print(f"  vs reference: {'; '.join(new_problems) or 'OK'}")
+            print(f"  vs legacy ({', '.join(legacy_cols)}): {'; '.join(legacy_problems) or 'OK'}")
+            print(f"  legacy sales/profit drift: {'; '.join(drift) or 'none'}")
+            failures += bool(new_problems or legacy_problems)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Publish static snapshots of the dashboard for the default and preset ranges.
+
+Most viewers only look at the default 2013-01-01 to 2016-12-31 view, yet each
+of them runs the whole script and its queries. This renders modern_app.py
+headless with Streamlit's AppTest once per date range and writes what it
+showed to disk:
+
+    <out>/<start>_<end>.json   metric cards by section, insights/recommendations, Plotly figures
+    <out>/<start>_<end>.html   the same, as a self-contained page
+    <out>/index.html           links to every snapshot and to the live app
+
+Serve the directory with any static file server and keep the live app for
+custom ranges:
+
+    python publish_snapshots.py --range 2015-01-01 2015-12-31 --live-url https://dash.example.com
+    python -m http.server --directory snapshots
+"""
+import argparse
+import datetime as dt
+import html
+import json
+import os
+import tomllib
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+from streamlit.testing.v1 import AppTest
+
+# The app's own default range (MIN_DATE/MAX_DATE in the sidebar)
+DEFAULT_RANGE = (dt.date(2013, 1, 1), dt.date(2016, 12, 31))
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="plotly.min.js"></script>
+<style>
+  body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1200px; color: #212529; }}
+  .header {{ background: linear-gradient(90deg, #1e3c72 0%, #2a5298 100%); color: white;
+             padding: 1.5rem 2rem; border-radius: 10px; margin-bottom: 2rem; }}
+  .metrics {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(220px, 1fr)); gap: 1rem; }}
+  .metric {{ padding: 1rem 1.5rem; border-radius: 10px; border: 1px solid #e9ecef;
+             border-left: 4px solid #2a5298; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+  .metric .value {{ font-size: 1.8rem; }}
+  .metric .delta {{ color: #6c757d; font-size: 0.9rem; }}
+</style>
+</head>
+<body>
+<div class="header">
+  <h1>{title}</h1>
+  <p>Static snapshot rendered {rendered_at}. {live}</p>
+</div>
+{body}
+</body>
+</html>
+"""
+
+
+def load_secrets(path):
+    with open(path, "rb") as f:
+        secrets = tomllib.load(f)
+    # Snapshots must hold complete, exact figures: no per-KPI deadlines
+    # (pending cards) and no sampled preview
+    secrets["azure_sql"].pop("kpi_timeout", None)
+    secrets["azure_sql"]["preview"] = False
+    return secrets
+
+
+def elements(block):
+    """The elements under an AppTest block, in page order, tabs and columns included."""
+    children = getattr(block, "children", None)
+    if children is None:
+        yield block
+        return
+    for key in sorted(children):
+        yield from elements(children[key])
+
+
+def render(at, start, end):
+    """Run the app for one range and collect what a viewer would read."""
+    at.date_input[0].set_value(start)
+    at.date_input[1].set_value(end)
+    at.run()
+    if at.exception:
+        raise SystemExit(f"{start} to {end}: {at.exception[0].value}")
+
+    # Metric cards under the heading they appear beneath: the KPI cards'
+    # "#### " groups, and the section subheaders of the tab metrics
+    metrics, heading = {}, None
+    for el in elements(at.main):
+        if el.type == "subheader":
+            heading = el.value
+        elif el.type == "markdown" and el.value.startswith("#### "):
+            heading = el.value[5:]
+        elif el.type == "metric":
+            metrics.setdefault(heading, []).append(
+                {"label": el.label, "value": el.value, "delta": el.delta})
+
+    # Executive summary: bullet lines under their "#### " headings
+    insights, heading = {}, None
+    for md in at.main.markdown:
+        if md.value.startswith("#### "):
+            heading = md.value[5:]
+        elif md.value.startswith("• ") and heading:
+            insights.setdefault(heading, []).append(md.value[2:])
+
+    figures = [json.loads(chart.proto.spec) for chart in at.main.get("plotly_chart")]
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "rendered_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "metrics": metrics,
+        "insights": insights,
+        "figures": figures,
+    }
+
+
+def snapshot_html(snap, live_url):
+    parts = ["<h2>📈 Metrics</h2>"]
+    for heading, cards in snap["metrics"].items():
+        parts.append(f'<h3>{html.escape(heading or "")}</h3>\n<div class="metrics">')
+        for m in cards:
+            parts.append(
+                f'<div class="metric"><div>{html.escape(m["label"])}</div>'
+                f'<div class="value">{html.escape(m["value"])}</div>'
+                f'<div class="delta">{html.escape(m["delta"] or "")}</div></div>'
+            )
+        parts.append("</div>")
+
+    parts.append("<h2>📋 Executive Summary</h2>")
+    for heading, lines in snap["insights"].items():
+        parts.append(f"<h3>{html.escape(heading)}</h3>\n<ul>")
+        parts.extend(f"<li>{html.escape(line)}</li>" for line in lines)
+        parts.append("</ul>")
+
+    parts.append("<h2>📊 Charts</h2>")
+    for fig in snap["figures"]:
+        parts.append(pio.to_html(pio.from_json(json.dumps(fig)),
+                                 include_plotlyjs=False, full_html=False))
+
+    live = (f'<a href="{html.escape(live_url)}" style="color: white">Open the live dashboard</a> '
+            "for other date ranges.") if live_url else ""
+    return PAGE.format(
+        title=f"Business Analytics Dashboard: {snap['start']} to {snap['end']}",
+        rendered_at=snap["rendered_at"],
+        live=live,
+        body="\n".join(parts),
+    )
+
+
+def index_html(snaps, live_url):
+    links = "\n".join(
+        f'<li><a href="{s["start"]}_{s["end"]}.html">{s["start"]} to {s["end"]}</a></li>'
+        for s in snaps
+    )
+    live = (f'<a href="{html.escape(live_url)}" style="color: white">Open the live dashboard</a> '
+            "for any other range.") if live_url else ""
+    return PAGE.format(
+        title="Business Analytics Dashboard",
+        rendered_at=max(s["rendered_at"] for s in snaps),
+        live=live,
+        body=f"<h2>📅 Published ranges</h2>\n<ul>\n{links}\n</ul>",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="modern_app.py")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--out", default="snapshots")
+    parser.add_argument("--range", nargs=2, action="append", default=[],
+                        type=dt.date.fromisoformat, metavar=("START", "END"),
+                        help="Preset range to publish besides the default one; repeatable")
+    parser.add_argument("--live-url", default=os.getenv("DASHBOARD_URL"),
+                        help="Live app to link to for custom ranges")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    at = AppTest.from_file(os.path.abspath(args.app), default_timeout=args.timeout)
+    at.secrets.update(load_secrets(args.secrets))
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception[0].value)
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, "plotly.min.js"), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
+    snaps = []
+    for start, end in [DEFAULT_RANGE] + [tuple(r) for r in args.range]:
+        snap = render(at, start, end)
+        stem = os.path.join(args.out, f"{snap['start']}_{snap['end']}")
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump(snap, f, ensure_ascii=False, indent=1)
+        with open(stem + ".html", "w", encoding="utf-8") as f:
+            f.write(snapshot_html(snap, args.live_url))
+        snaps.append(snap)
+        count = sum(len(cards) for cards in snap["metrics"].values())
+        print(f"{snap['start']} to {snap['end']}: {count} metrics, "
+              f"{len(snap['figures'])} figures -> {stem}.html")
+
+    with open(os.path.join(args.out, "index.html"), "w", encoding="utf-8") as f:
+        f.write(index_html(snaps, args.live_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""SQL shared by the dashboard and the offline tools in this repo."""
+import datetime as dt
+
+import pandas as pd
+
+
+def proc_sql(proc_name: str, params=()):
+    return f"EXEC {proc_name}" + \
+        (" " + ",".join("?" for _ in params) if params else "")
+
+
+def kpi_calls(s, e, cs=None, ce=None):
+    """Map each KPI name to the procedure and parameters that produce it.
+
+    With a comparison window (cs, ce) the KPI card procedures also return
+    Prev* columns for it, from the same scan (sql/SQLQuery37.sql).
+    """
+    dated = (s, e, cs, ce) if cs is not None else (s, e)
+    return {
+        "sales_vs_pur":           ("dbo.usp_KPI_SalesVsPurchases", dated),
+        "avg_margin_with_group":  ("dbo.usp_KPI_AvgMarginPerProductWithGroup", (s, e)),
+        "deal_cov":               ("dbo.usp_KPI_DealCoverage", (s, e)),
+        "movement":               ("dbo.usp_KPI_StockMovementVolume", dated),
+        "top_clients":            ("dbo.usp_KPI_MostDiscountedClients", (10,)),
+        "supplier_perf":          ("dbo.usp_KPI_SupplierPerformance", (s, e)),
+        "promo_perf":             ("dbo.usp_KPI_PromoPerformance", (s, e)),
+        "txn_dist":               ("dbo.usp_KPI_TransactionDistribution", dated),
+        "gross":                  ("dbo.usp_KPI_GrossProfit", dated),
+        "cogs_vs_po":             ("dbo.usp_KPI_COGSvsPurchases", dated),
+        "promo_by_group":         ("dbo.usp_KPI_PromoDealsByStockGroup", ()),
+        "promo_by_buy":           ("dbo.usp_KPI_PromoPerformanceByBuyingGroup", (s, e)),
+        "tax_variance":           ("dbo.usp_KPI_SupposedTaxAmount", (s, e)),
+        "sales_by_group":         ("dbo.usp_KPI_SalesByStockGroup", (s, e)),
+        "cust_seg":               ("dbo.usp_KPI_CustomerSegmentSales", (s, e)),
+        "imbalance":              ("dbo.usp_KPI_ProductImbalance_SingleRow", (s, e, 10)),
+    }
+
+
+def compare_window(start, end, mode):
+    """Datetime bounds of the window `mode` compares [start, end] with, or (None, None)."""
+    if mode == "Previous period":
+        prev_end = start - dt.timedelta(days=1)
+        prev_start = prev_end - (end - start)
+    elif mode == "Same period last year":
+        prev_start = (pd.Timestamp(start) - pd.DateOffset(years=1)).date()
+        prev_end = (pd.Timestamp(end) - pd.DateOffset(years=1)).date()
+    else:
+        return None, None
+    return (dt.datetime.combine(prev_start, dt.time.min),
+            dt.datetime.combine(prev_end, dt.time.max))
+
+
+def compare_shift(start, end, mode):
+    """(months, days) that move each day of the comparison window onto [start, end].
+
+    COMPARE_TREND_SQL moves a day d to DATEADD(DAY, days, DATEADD(MONTH,
+    months, d)). The previous period moves by its length in days; last year
+    moves by twelve months, so 29 February lands on the 28th.
+    """
+    if mode == "Previous period":
+        return 0, (end - start).days + 1
+    if mode == "Same period last year":
+        return 12, 0
+    return 0, 0
+
+
+def kpi_batch_sql(calls):
+    """Fold {name: (proc, params)} into one multi-statement batch and its flat params."""
+    sql = "SET NOCOUNT ON;\n" + ";\n".join(
+        proc_sql(proc, params) for proc, params in calls.values()
+    ) + ";"
+    params = [p for _, params in calls.values() for p in params]
+    return sql, params
+
+
+def read_result_sets(cursor, names):
+    """Walk a cursor's result sets (nextset) into {name: DataFrame}, in order."""
+    frames = {}
+    for i, name in enumerate(names):
+        if i > 0 and not cursor.nextset():
+            raise RuntimeError(f"Batch ended before the result set for '{name}'")
+        while cursor.description is None:  # row counts from statements without output
+            if not cursor.nextset():
+                raise RuntimeError(f"Batch ended before the result set for '{name}'")
+        columns = [col[0] for col in cursor.description]
+        frames[name] = pd.DataFrame.from_records(
+            [tuple(row) for row in cursor.fetchall()],
+            columns=columns,
+            coerce_float=True,
+        )
+    return frames
+
+
+# Versions of every KPI procedure and dbo/dw table (sql/SQLQuery38.sql)
+SOURCE_VERSIONS_PROC = "dbo.usp_KPI_SourceVersions"
+
+# Tables TREND_SQL and COMPARE_TREND_SQL read, for their fingerprint
+TREND_SOURCES = ("dw.FactInvoiceLine", "dw.FactPurchaseOrderLine", "dw.DimDate")
+
+# Monthly sales vs purchases from the dw star schema (sql/SQLQuery34.sql);
+# bind :start and :end with sqlalchemy.text()
+TREND_SQL = """
+  WITH Sales AS (
+    SELECT 
+      d.MonthStart AS Period,
+      SUM(f.ExtendedPrice) AS Sales
+    FROM dw.FactInvoiceLine f
+    JOIN dw.DimDate d ON d.DateKey = f.DateKey
+    WHERE f.LastEditedWhen BETWEEN :start AND :end
+    GROUP BY d.MonthStart
+  ), Purchases AS (
+    SELECT 
+      d.MonthStart AS Period,
+      SUM(f.PurchaseAmount) AS Purchases
+    FROM dw.FactPurchaseOrderLine f
+    JOIN dw.DimDate d ON d.DateKey = f.DateKey
+    WHERE f.LastReceiptDate BETWEEN CAST(:start AS DATE) AND CAST(:end AS DATE)
+    GROUP BY d.MonthStart
+  )
+  SELECT 
+    COALESCE(s.Period, p.Period) AS Period,
+    COALESCE(s.Sales, 0)       AS Sales,
+    COALESCE(p.Purchases, 0)   AS Purchases
+  FROM Sales s
+  FULL OUTER JOIN Purchases p ON s.Period = p.Period
+  ORDER BY Period;
+"""
+
+
+# TREND_SQL plus PrevSales/PrevPurchases for the comparison window
+# :cstart-:cend, read in the same scan of each fact. Sums are kept per day so
+# each comparison day can be moved by :shift_months and :shift_days (see
+# compare_shift) onto the day it is compared with, then bucketed by the month
+# it lands in; moving whole months would misplace windows that do not start
+# on the 1st. Last year's 28 February can land just before a range starting
+# on the 29th, hence the filter from the first of the month.
+COMPARE_TREND_SQL = """
+  WITH SalesDays AS (
+    SELECT 
+      d.[Date],
+      SUM(CASE WHEN f.LastEditedWhen BETWEEN :start AND :end
+               THEN f.ExtendedPrice END) AS Sales,
+      SUM(CASE WHEN f.LastEditedWhen BETWEEN :cstart AND :cend
+               THEN f.ExtendedPrice END) AS PrevSales
+    FROM dw.FactInvoiceLine f
+    JOIN dw.DimDate d ON d.DateKey = f.DateKey
+    WHERE f.LastEditedWhen BETWEEN :start AND :end
+       OR f.LastEditedWhen BETWEEN :cstart AND :cend
+    GROUP BY d.[Date]
+  ), PurchaseDays AS (
+    SELECT 
+      d.[Date],
+      SUM(CASE WHEN f.LastReceiptDate BETWEEN CAST(:start AS DATE) AND CAST(:end AS DATE)
+               THEN f.PurchaseAmount END) AS Purchases,
+      SUM(CASE WHEN f.LastReceiptDate BETWEEN CAST(:cstart AS DATE) AND CAST(:cend AS DATE)
+               THEN f.PurchaseAmount END) AS PrevPurchases
+    FROM dw.FactPurchaseOrderLine f
+    JOIN dw.DimDate d ON d.DateKey = f.DateKey
+    WHERE f.LastReceiptDate BETWEEN CAST(:start AS DATE) AND CAST(:end AS DATE)
+       OR f.LastReceiptDate BETWEEN CAST(:cstart AS DATE) AND CAST(:cend AS DATE)
+    GROUP BY d.[Date]
+  ), Days AS (
+    SELECT v.*
+    FROM SalesDays x
+    CROSS APPLY (VALUES
+      (x.[Date], x.Sales, NULL, NULL, NULL),
+      (DATEADD(DAY, :shift_days, DATEADD(MONTH, :shift_months, x.[Date])),
+       NULL, NULL, x.PrevSales, NULL)
+    ) v([Date], Sales, Purchases, PrevSales, PrevPurchases)
+    UNION ALL
+    SELECT v.*
+    FROM PurchaseDays x
+    CROSS APPLY (VALUES
+      (x.[Date], NULL, x.Purchases, NULL, NULL),
+      (DATEADD(DAY, :shift_days, DATEADD(MONTH, :shift_months, x.[Date])),
+       NULL, NULL, NULL, x.PrevPurchases)
+    ) v([Date], Sales, Purchases, PrevSales, PrevPurchases)
+  )
+  SELECT 
+    DATEFROMPARTS(YEAR([Date]), MONTH([Date]), 1) AS Period,
+    COALESCE(SUM(Sales), 0)         AS Sales,
+    COALESCE(SUM(Purchases), 0)     AS Purchases,
+    COALESCE(SUM(PrevSales), 0)     AS PrevSales,
+    COALESCE(SUM(PrevPurchases), 0) AS PrevPurchases
+  FROM Days
+  WHERE [Date] >= DATEFROMPARTS(YEAR(:start), MONTH(:start), 1)
+    AND [Date] <= CAST(:end AS DATE)
+  GROUP BY DATEFROMPARTS(YEAR([Date]), MONTH([Date]), 1)
+  ORDER BY Period;
+"""
+
+
+# Fast-preview estimates from the pre-drawn samples (sql/SQLQuery36.sql).
+# Each sampled row stands for Weight rows of its fact, so SUM(x * Weight)
+# estimates the total and SQRT(SUM(Weight * (Weight - 1) * x * x)) is its
+# standard error. Purchases are small enough to stay exact.
+PREVIEW_TOTALS_SQL = """
+  WITH Lines AS (
+    SELECT
+      SUM(ExtendedPrice * Weight) AS Sales,
+      SQRT(SUM(Weight * (Weight - 1) * SQUARE(ExtendedPrice))) AS SalesSE,
+      SUM(LineProfit * Weight) AS Profit,
+      SQRT(SUM(Weight * (Weight - 1) * SQUARE(LineProfit))) AS ProfitSE,
+      SUM((ExtendedPrice - LineProfit) * Weight) AS COGS,
+      SQRT(SUM(Weight * (Weight - 1) * SQUARE(ExtendedPrice - LineProfit))) AS COGSSE
+    FROM dw.FactInvoiceLineSample
+    WHERE LastEditedWhen BETWEEN :start AND :end
+  ), Stock AS (
+    SELECT
+      SUM(Weight) AS Transactions,
+      SQRT(SUM(Weight * (Weight - 1))) AS TransactionsSE,
+      SUM(Quantity * Weight) AS Movement,
+      SQRT(SUM(Weight * (Weight - 1) * SQUARE(Quantity))) AS MovementSE
+    FROM dw.FactStockTransactionSample
+    WHERE TransactionOccurredWhen BETWEEN :start AND :end
+  )
+  SELECT 
+    l.Sales, l.SalesSE, l.Profit, l.ProfitSE, l.COGS, l.COGSSE,
+    s.Transactions, s.TransactionsSE, s.Movement, s.MovementSE,
+    (SELECT SUM(PurchaseAmount)
+     FROM dw.FactPurchaseOrderLine
+     WHERE LastReceiptDate BETWEEN CAST(:start AS DATE) AND CAST(:end AS DATE)
+    ) AS Purchases
+  FROM Lines l
+  CROSS JOIN Stock s;
+"""
+
+# TREND_SQL with Sales estimated from the sample, plus its standard error
+PREVIEW_TREND_SQL = """
+  WITH Sales AS (
+    SELECT 
+      d.MonthStart AS Period,
+      SUM(f.ExtendedPrice * f.Weight) AS Sales,
+      SQRT(SUM(f.Weight * (f.Weight - 1) * SQUARE(f.ExtendedPrice))) AS SalesSE
+    FROM dw.FactInvoiceLineSample f
+    JOIN dw.DimDate d ON d.DateKey = f.DateKey
+    WHERE f.LastEditedWhen BETWEEN :start AND :end
+    GROUP BY d.MonthStart
+  ), Purchases AS (
+    SELECT 
+      d.MonthStart AS Period,
+      SUM(f.PurchaseAmount) AS Purchases
+    FROM dw.FactPurchaseOrderLine f
+    JOIN dw.DimDate d ON d.DateKey = f.DateKey
+    WHERE f.LastReceiptDate BETWEEN CAST(:start AS DATE) AND CAST(:end AS DATE)
+    GROUP BY d.MonthStart
+  )
+  SELECT 
+    COALESCE(s.Period, p.Period) AS Period,
+    COALESCE(s.Sales, 0)       AS Sales,
+    COALESCE(s.SalesSE, 0)     AS SalesSE,
+    COALESCE(p.Purchases, 0)   AS Purchases
+  FROM Sales s
+  FULL OUTER JOIN Purchases p ON s.Period = p.Period
+  ORDER BY Period;
+"""
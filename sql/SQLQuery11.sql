@@ -13,19 +13,24 @@ CREATE PROCEDURE dbo.usp_KPI_SalesVsPurchases
 AS
 BEGIN
     SET NOCOUNT ON;
+    /* open-ended bounds become literal limits so range predicates stay sargable */
+    SET @StartDate = COALESCE(@StartDate, '17530101');
+    SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
     SELECT
       /* sales from invoice lines, filter on LastEditedWhen */
       (SELECT SUM(ExtendedPrice)
        FROM dbo.SalesInvoiceLines
-       WHERE (@StartDate IS NULL OR LastEditedWhen >= @StartDate)
-         AND (@EndDate   IS NULL OR LastEditedWhen <= @EndDate)
+       WHERE LastEditedWhen >= @StartDate
+         AND LastEditedWhen <= @EndDate
       ) AS TotalSales,
       /* purchases from PO lines, filter on LastReceiptDate */
       (SELECT SUM(ExpectedUnitPricePerOuter * OrderedOuters)
        FROM dbo.PurchaseOrderLines
-       WHERE (@StartDate IS NULL OR LastReceiptDate >= @StartDate)
-         AND (@EndDate   IS NULL OR LastReceiptDate <= @EndDate)
-      ) AS TotalPurchases;
+       WHERE LastReceiptDate >= @StartDate
+         AND LastReceiptDate <= @EndDate
+      ) AS TotalPurchases
+    OPTION (RECOMPILE);
 END
 GO
 
@@ -38,6 +43,9 @@ CREATE OR ALTER PROCEDURE dbo.usp_KPI_AvgMarginPerProductWithGroup
 AS
 BEGIN
     SET NOCOUNT ON;
+    /* open-ended bounds become literal limits so range predicates stay sargable */
+    SET @StartDate = COALESCE(@StartDate, '17530101');
+    SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
     SELECT
       si.StockItemID,
@@ -60,27 +68,33 @@ BEGIN
       ON sisg.StockItemID = si.StockItemID
     LEFT JOIN dbo.WarehouseStockGroups AS sg
       ON sg.StockGroupID = sisg.StockGroupID
-    WHERE (@StartDate IS NULL OR il.LastEditedWhen >= @StartDate)
-      AND (@EndDate   IS NULL OR il.LastEditedWhen <= @EndDate)
+    WHERE il.LastEditedWhen >= @StartDate
+      AND il.LastEditedWhen <= @EndDate
     GROUP BY
       si.StockItemID,
       si.StockItemName,
       sg.StockGroupID,
       sg.StockGroupName
-    ORDER BY AvgMargin DESC;
+    ORDER BY AvgMargin DESC
+    OPTION (RECOMPILE);
 END;
 GO
 
 /* ────────────────────────────────────────────────────────────────────
    3. Deal Coverage → % of stock groups with at least one deal
+      running at some point inside the date window
 ─────────────────────────────────────────────────────────────────────*/
 IF OBJECT_ID('dbo.usp_KPI_DealCoverage','P') IS NOT NULL
   DROP PROCEDURE dbo.usp_KPI_DealCoverage;
 GO
 CREATE PROCEDURE dbo.usp_KPI_DealCoverage
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   DECLARE 
     @TotalGroups    INT = (SELECT COUNT(*) FROM dbo.WarehouseStockGroups),
@@ -88,6 +102,8 @@ BEGIN
       SELECT COUNT(DISTINCT StockGroupID)
       FROM dbo.SalesSpecialDeals
       WHERE StockGroupID IS NOT NULL
+        AND StartDate <= @EndDate
+        AND EndDate   >= @StartDate
     );
 
   SELECT
@@ -111,11 +127,16 @@ CREATE PROCEDURE dbo.usp_KPI_StockMovementVolume
 AS
 BEGIN
     SET NOCOUNT ON;
+    /* open-ended bounds become literal limits so range predicates stay sargable */
+    SET @StartDate = COALESCE(@StartDate, '17530101');
+    SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
     SELECT
       SUM(Quantity) AS TotalMovementVolume
     FROM dbo.StockItemTransactions
-    WHERE (@StartDate IS NULL OR TransactionOccurredWhen >= @StartDate)
-      AND (@EndDate   IS NULL OR TransactionOccurredWhen <= @EndDate);
+    WHERE TransactionOccurredWhen >= @StartDate
+      AND TransactionOccurredWhen <= @EndDate
+    OPTION (RECOMPILE);
 END
 GO
 
@@ -5,9 +5,14 @@ GO
   1. Supplier Performance
 ──────────────────────────────────────────────────────────────────────*/
 CREATE OR ALTER PROCEDURE dbo.usp_KPI_SupplierPerformance
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   ;WITH Receipts AS (
     SELECT
@@ -20,6 +25,8 @@ BEGIN
     WHERE
       tt.TransactionTypeName = 'Stock Receipt'
       AND sit.SupplierID IS NOT NULL
+      AND sit.TransactionOccurredWhen >= @StartDate
+      AND sit.TransactionOccurredWhen <= @EndDate
   ),
   Numbered AS (
     SELECT
@@ -43,7 +50,8 @@ BEGIN
   GROUP BY
     s.SupplierID,
     sp.SupplierName
-  ORDER BY TotalQtyReceived DESC;
+  ORDER BY TotalQtyReceived DESC
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -53,39 +61,76 @@ GO
 ──────────────────────────────────────────────────────────────────────*/
 -- 1) Overall promo performance (deals + sales/profit)
 CREATE OR ALTER PROCEDURE dbo.usp_KPI_PromoPerformance
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
+  /* invoice lines are aggregated per item once, then rolled up per group,
+     so each sale is counted once per group however many deals cover it */
+  ;WITH ItemSales AS (
+    SELECT
+      StockItemID,
+      SUM(ExtendedPrice) AS Sales,
+      SUM(LineProfit)    AS Profit
+    FROM dbo.SalesInvoiceLines
+    WHERE LastEditedWhen >= @StartDate
+      AND LastEditedWhen <= @EndDate
+    GROUP BY StockItemID
+  ),
+  GroupSales AS (
+    SELECT
+      sisg.StockGroupID,
+      SUM(s.Sales)  AS Sales,
+      SUM(s.Profit) AS Profit
+    FROM ItemSales AS s
+    JOIN dbo.StockItemsStockGroups AS sisg
+      ON sisg.StockItemID = s.StockItemID
+    GROUP BY sisg.StockGroupID
+  ),
+  /* one row per deal and group: bridge if present, else deal’s own GroupID */
+  DealGroups AS (
+    SELECT DISTINCT
+      sd.SpecialDealID,
+      sd.BuyingGroupID,
+      sd.DiscountPercentage,
+      COALESCE(sisg.StockGroupID, sd.StockGroupID) AS StockGroupID
+    FROM dbo.SalesSpecialDeals AS sd
+    LEFT JOIN dbo.StockItemsStockGroups AS sisg
+      ON sisg.StockItemID = sd.StockItemID
+    /* only deals running at some point inside the window */
+    WHERE sd.StartDate <= @EndDate
+      AND sd.EndDate   >= @StartDate
+  ),
+  GroupDeals AS (
+    SELECT
+      StockGroupID,
+      COUNT(*)                AS ActiveDeals,
+      AVG(DiscountPercentage) AS AvgDiscountPct,
+      MAX(DiscountPercentage) AS MaxDiscountPct
+    FROM DealGroups
+    GROUP BY StockGroupID
+  )
   SELECT
     grp.StockGroupID,
     grp.StockGroupName,
-    COUNT(DISTINCT sd.SpecialDealID) AS ActiveDeals,
-    AVG(sd.DiscountPercentage)      AS AvgDiscountPct,
-    MAX(sd.DiscountPercentage)      AS MaxDiscountPct,
-    SUM(COALESCE(il.ExtendedPrice, 0)) AS SalesDuringDeals,
-    SUM(COALESCE(il.LineProfit,    0)) AS ProfitDuringDeals
-  FROM dbo.SalesSpecialDeals AS sd
-
-  /* map item-level deals to groups */
-  LEFT JOIN dbo.StockItemsStockGroups AS sisg
-    ON sisg.StockItemID = sd.StockItemID
-
-  /* determine group: bridge if present, else deal’s own GroupID */
+    gd.ActiveDeals,
+    gd.AvgDiscountPct,
+    gd.MaxDiscountPct,
+    COALESCE(gs.Sales,  0) AS SalesDuringDeals,
+    COALESCE(gs.Profit, 0) AS ProfitDuringDeals
+  FROM GroupDeals AS gd
   JOIN dbo.WarehouseStockGroups AS grp
-    ON grp.StockGroupID = COALESCE(sisg.StockGroupID, sd.StockGroupID)
-
-  /* pull every sale for any item in that group */
-  LEFT JOIN dbo.StockItemsStockGroups AS sisg2
-    ON sisg2.StockGroupID = grp.StockGroupID
-  LEFT JOIN dbo.SalesInvoiceLines       AS il
-    ON il.StockItemID = sisg2.StockItemID
-
-  GROUP BY
-    grp.StockGroupID,
-    grp.StockGroupName
+    ON grp.StockGroupID = gd.StockGroupID
+  LEFT JOIN GroupSales AS gs
+    ON gs.StockGroupID = gd.StockGroupID
   ORDER BY
-    ActiveDeals DESC;
+    ActiveDeals DESC
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -98,9 +143,14 @@ IF OBJECT_ID('dbo.usp_KPI_CustomerSegmentSales','P') IS NOT NULL
 GO
 
 CREATE PROCEDURE dbo.usp_KPI_CustomerSegmentSales
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   SELECT
     cc.CustomerCategoryName,
@@ -114,8 +164,11 @@ BEGIN
     ON cc.CustomerCategoryID = c.CustomerCategoryID
   WHERE sit.CustomerID IS NOT NULL
     AND sit.TransactionTypeID = 10    -- Stock Issue
+    AND sit.TransactionOccurredWhen >= @StartDate
+    AND sit.TransactionOccurredWhen <= @EndDate
   GROUP BY cc.CustomerCategoryName
-  ORDER BY TotalQtyShipped DESC;
+  ORDER BY TotalQtyShipped DESC
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -130,6 +183,9 @@ CREATE OR ALTER PROCEDURE dbo.usp_KPI_TransactionDistribution
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   SELECT
     tt.TransactionTypeName,
@@ -139,10 +195,11 @@ BEGIN
   JOIN dbo.ApplicationTransactionTypes tt
     ON tt.TransactionTypeID = sit.TransactionTypeID
   WHERE
-    (@StartDate IS NULL OR sit.TransactionOccurredWhen >= @StartDate)
-    AND (@EndDate   IS NULL OR sit.TransactionOccurredWhen <= @EndDate)
+    sit.TransactionOccurredWhen >= @StartDate
+    AND sit.TransactionOccurredWhen <= @EndDate
   GROUP BY tt.TransactionTypeName
-  ORDER BY TxnCount DESC;
+  ORDER BY TxnCount DESC
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -155,13 +212,16 @@ CREATE OR ALTER PROCEDURE dbo.usp_KPI_ProductImbalance_SingleRow
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   ;WITH
   Sales AS (
     SELECT StockItemID, SUM(Quantity) AS QtySold
     FROM dbo.SalesInvoiceLines
-    WHERE (@StartDate IS NULL OR LastEditedWhen >= @StartDate)
-      AND (@EndDate   IS NULL OR LastEditedWhen <= @EndDate)
+    WHERE LastEditedWhen >= @StartDate
+      AND LastEditedWhen <= @EndDate
     GROUP BY StockItemID
   ),
   Purch AS (
@@ -172,8 +232,8 @@ BEGIN
     FROM dbo.PurchaseOrderLines pol
     JOIN dbo.PurchaseOrders po
       ON po.PurchaseOrderID = pol.PurchaseOrderID
-    WHERE (@StartDate IS NULL OR pol.LastReceiptDate >= @StartDate)
-      AND (@EndDate   IS NULL OR pol.LastReceiptDate <= @EndDate)
+    WHERE pol.LastReceiptDate >= @StartDate
+      AND pol.LastReceiptDate <= @EndDate
     GROUP BY pol.StockItemID, po.SupplierID
   ),
   Imb AS (
@@ -222,7 +282,8 @@ BEGIN
     i.NetBuildUp,
     i.PurchaseToSalesRatio
   ORDER BY
-    NetBuildUp DESC;
+    NetBuildUp DESC
+  OPTION (RECOMPILE);
 END;
 GO
 
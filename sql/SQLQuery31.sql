@@ -2,25 +2,44 @@
 GO
 
 CREATE OR ALTER PROCEDURE dbo.usp_KPI_GrossProfit
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
   SELECT
     SUM(LineProfit)   AS TotalProfit,
     SUM(ExtendedPrice) AS TotalRevenue,
     (SUM(LineProfit)*1.0)/NULLIF(SUM(ExtendedPrice),0) AS GrossMarginPct
-  FROM dbo.SalesInvoiceLines;
+  FROM dbo.SalesInvoiceLines
+  WHERE LastEditedWhen >= @StartDate
+    AND LastEditedWhen <= @EndDate
+  OPTION (RECOMPILE);
 END;
 GO
 
 CREATE OR ALTER PROCEDURE dbo.usp_KPI_COGSvsPurchases
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
   SELECT
     SUM(ExtendedPrice - LineProfit) AS COGS,
-    (SELECT SUM(ExpectedUnitPricePerOuter*OrderedOuters) FROM dbo.PurchaseOrderLines) AS TotalPurchases
-  FROM dbo.SalesInvoiceLines;
+    (SELECT SUM(ExpectedUnitPricePerOuter*OrderedOuters)
+     FROM dbo.PurchaseOrderLines
+     WHERE LastReceiptDate >= @StartDate
+       AND LastReceiptDate <= @EndDate) AS TotalPurchases
+  FROM dbo.SalesInvoiceLines
+  WHERE LastEditedWhen >= @StartDate
+    AND LastEditedWhen <= @EndDate
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -59,42 +78,80 @@ GO
 
 -- 3) Promo performance by BuyingGroup × StockGroup
 CREATE OR ALTER PROCEDURE dbo.usp_KPI_PromoPerformanceByBuyingGroup
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
+  /* invoice lines are aggregated per item once, then rolled up per group,
+     so each sale is counted once per group however many deals cover it */
+  ;WITH ItemSales AS (
+    SELECT
+      StockItemID,
+      SUM(ExtendedPrice) AS Sales,
+      SUM(LineProfit)    AS Profit
+    FROM dbo.SalesInvoiceLines
+    WHERE LastEditedWhen >= @StartDate
+      AND LastEditedWhen <= @EndDate
+    GROUP BY StockItemID
+  ),
+  GroupSales AS (
+    SELECT
+      sisg.StockGroupID,
+      SUM(s.Sales)  AS Sales,
+      SUM(s.Profit) AS Profit
+    FROM ItemSales AS s
+    JOIN dbo.StockItemsStockGroups AS sisg
+      ON sisg.StockItemID = s.StockItemID
+    GROUP BY sisg.StockGroupID
+  ),
+  /* one row per deal and group: bridge if present, else deal’s own GroupID */
+  DealGroups AS (
+    SELECT DISTINCT
+      sd.SpecialDealID,
+      sd.BuyingGroupID,
+      sd.DiscountPercentage,
+      COALESCE(sisg.StockGroupID, sd.StockGroupID) AS StockGroupID
+    FROM dbo.SalesSpecialDeals AS sd
+    LEFT JOIN dbo.StockItemsStockGroups AS sisg
+      ON sisg.StockItemID = sd.StockItemID
+    /* only deals running at some point inside the window */
+    WHERE sd.StartDate <= @EndDate
+      AND sd.EndDate   >= @StartDate
+  ),
+  BuyingGroupDeals AS (
+    SELECT
+      BuyingGroupID,
+      StockGroupID,
+      COUNT(*)                AS DealCount,
+      AVG(DiscountPercentage) AS AvgDiscountPct
+    FROM DealGroups
+    WHERE BuyingGroupID IS NOT NULL
+    GROUP BY BuyingGroupID, StockGroupID
+  )
   SELECT
     bg.BuyingGroupID,
     bg.BuyingGroupName,
     grp.StockGroupID,
     grp.StockGroupName,
-    COUNT(DISTINCT sd.SpecialDealID)    AS DealCount,
-    AVG(sd.DiscountPercentage)         AS AvgDiscountPct,
-    SUM(COALESCE(il.ExtendedPrice, 0)) AS SalesDuringDeals,
-    SUM(COALESCE(il.LineProfit,    0)) AS ProfitDuringDeals
-  FROM dbo.SalesSpecialDeals AS sd
-  JOIN dbo.SalesBuyingGroups       AS bg
-    ON bg.BuyingGroupID = sd.BuyingGroupID
-
-  LEFT JOIN dbo.StockItemsStockGroups AS sisg
-    ON sisg.StockItemID = sd.StockItemID
-
+    bd.DealCount,
+    bd.AvgDiscountPct,
+    COALESCE(gs.Sales,  0) AS SalesDuringDeals,
+    COALESCE(gs.Profit, 0) AS ProfitDuringDeals
+  FROM BuyingGroupDeals AS bd
+  JOIN dbo.SalesBuyingGroups AS bg
+    ON bg.BuyingGroupID = bd.BuyingGroupID
   JOIN dbo.WarehouseStockGroups AS grp
-    ON grp.StockGroupID = COALESCE(sisg.StockGroupID, sd.StockGroupID)
-
-  LEFT JOIN dbo.StockItemsStockGroups AS sisg2
-    ON sisg2.StockGroupID = grp.StockGroupID
-
-  LEFT JOIN dbo.SalesInvoiceLines AS il
-    ON il.StockItemID = sisg2.StockItemID
-
-  GROUP BY
-    bg.BuyingGroupID,
-    bg.BuyingGroupName,
-    grp.StockGroupID,
-    grp.StockGroupName
+    ON grp.StockGroupID = bd.StockGroupID
+  LEFT JOIN GroupSales AS gs
+    ON gs.StockGroupID = bd.StockGroupID
   ORDER BY
-    SalesDuringDeals DESC;
+    SalesDuringDeals DESC
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -106,6 +163,9 @@ CREATE OR ALTER PROCEDURE dbo.usp_KPI_SupposedTaxAmount
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   SELECT
     il.InvoiceLineID,
@@ -125,8 +185,9 @@ BEGIN
         ,2)
       AS TaxVariance
   FROM dbo.SalesInvoiceLines il
-  WHERE (@StartDate IS NULL OR il.LastEditedWhen >= @StartDate)
-    AND (@EndDate   IS NULL OR il.LastEditedWhen <= @EndDate);
+  WHERE il.LastEditedWhen >= @StartDate
+    AND il.LastEditedWhen <= @EndDate
+  OPTION (RECOMPILE);
 END;
 GO
 
@@ -137,6 +198,9 @@ CREATE OR ALTER PROCEDURE dbo.usp_KPI_SalesByStockGroup
 AS
 BEGIN
   SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
 
   ;WITH SalesLines AS (
     -- Pull only the invoice‐lines in your date window, with Customer
@@ -150,8 +214,8 @@ BEGIN
     LEFT JOIN dbo.SalesInvoices AS si
       ON si.InvoiceID = il.InvoiceID
     WHERE 
-      (@StartDate IS NULL OR il.LastEditedWhen >= @StartDate)
-      AND (@EndDate   IS NULL OR il.LastEditedWhen <= @EndDate)
+      il.LastEditedWhen >= @StartDate
+      AND il.LastEditedWhen <= @EndDate
   ),
   SalesWithGroups AS (
     -- Map each sale into its stock‐group, falling back to sd.StockGroupID if needed
@@ -197,6 +261,7 @@ BEGIN
     sg.StockGroupName,
     cn.CountryName
   ORDER BY
-    TotalUnitsSold DESC;
+    TotalUnitsSold DESC
+  OPTION (RECOMPILE);
 END;
 GO
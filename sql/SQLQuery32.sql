@@ -0,0 +1,61 @@
+USE project4;
+GO
+
+/* Covering indexes for the KPI workload.
+   Generated candidates from index_advisor.py, reviewed and merged by hand.
+
+   SQLQuery35.sql later moved most KPI procedures onto the dw star schema,
+   so these dbo indexes no longer serve them. What still reads through each:
+     1, 3, 4  bulk exports of the raw fact tables by date range
+              (modern_app.EXPORT_TABLES)
+     2        the _Legacy promo procedures (SQLQuery33.sql) that
+              promo_regression.py compares against
+     5        usp_KPI_DealCoverage (StockGroupID), usp_KPI_MostDiscountedClients
+              (BuyingGroupID), usp_KPI_PromoDealsByStockGroup and the dw promo
+              procedures, which still join dbo.SalesSpecialDeals (StockItemID)
+     6        usp_KPI_PromoDealsByStockGroup and the _Legacy promo procedures */
+
+-- 1. Widen the invoice-line date index so tax variance and sales-by-group
+--    (InvoiceID, TaxRate, TaxAmount) are covered as well
+CREATE NONCLUSTERED INDEX IX_SIL_LastEditedWhen_StockItemID
+ON dbo.SalesInvoiceLines(LastEditedWhen)
+INCLUDE(StockItemID, InvoiceID, LineProfit, Quantity, ExtendedPrice, TaxRate, TaxAmount)
+WITH (DROP_EXISTING = ON);
+
+-- 2. Invoice lines by item for the promo procedures (join on StockItemID)
+CREATE NONCLUSTERED INDEX IX_SIL_StockItemID
+ON dbo.SalesInvoiceLines(StockItemID, LastEditedWhen)
+INCLUDE(ExtendedPrice, LineProfit);
+
+-- 3. Purchase lines by receipt date: sales vs purchases, COGS, imbalance, trend
+CREATE NONCLUSTERED INDEX IX_POL_LastReceiptDate
+ON dbo.PurchaseOrderLines(LastReceiptDate)
+INCLUDE(PurchaseOrderID, StockItemID, OrderedOuters, ExpectedUnitPricePerOuter);
+
+-- 4. Stock transactions by date alone: movement volume and type distribution
+--    have no TransactionTypeID predicate, so IX_SIT_ByType_Date cannot seek
+CREATE NONCLUSTERED INDEX IX_SIT_Date
+ON dbo.StockItemTransactions(TransactionOccurredWhen)
+INCLUDE(TransactionTypeID, Quantity);
+
+-- 5. Special deals by each of the keys the promo procedures join on
+CREATE NONCLUSTERED INDEX IX_SSD_StockItemID
+ON dbo.SalesSpecialDeals(StockItemID)
+INCLUDE(StockGroupID, BuyingGroupID, DiscountPercentage, StartDate, EndDate);
+
+CREATE NONCLUSTERED INDEX IX_SSD_StockGroupID
+ON dbo.SalesSpecialDeals(StockGroupID)
+INCLUDE(StockItemID, BuyingGroupID, DiscountPercentage, StartDate, EndDate);
+
+CREATE NONCLUSTERED INDEX IX_SSD_BuyingGroupID
+ON dbo.SalesSpecialDeals(BuyingGroupID)
+INCLUDE(StockItemID, StockGroupID, DiscountPercentage, StartDate, EndDate);
+
+-- 6. Item <-> group bridge in both directions (SELECT INTO dropped the WWI keys)
+CREATE UNIQUE NONCLUSTERED INDEX UX_SISG_Item_Group
+ON dbo.StockItemsStockGroups(StockItemID, StockGroupID);
+
+CREATE UNIQUE NONCLUSTERED INDEX UX_SISG_Group_Item
+ON dbo.StockItemsStockGroups(StockGroupID, StockItemID);
+
+GO
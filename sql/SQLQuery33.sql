@@ -0,0 +1,97 @@
+USE project4;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  Pre-rewrite promo procedures, kept under _Legacy names so
+  promo_regression.py can compare them with the set-based versions.
+  They join every deal to every invoice line of every item in the
+  group, so sales are multiplied by the number of deals per group.
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_PromoPerformance_Legacy
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    grp.StockGroupID,
+    grp.StockGroupName,
+    COUNT(DISTINCT sd.SpecialDealID) AS ActiveDeals,
+    AVG(sd.DiscountPercentage)      AS AvgDiscountPct,
+    MAX(sd.DiscountPercentage)      AS MaxDiscountPct,
+    SUM(COALESCE(il.ExtendedPrice, 0)) AS SalesDuringDeals,
+    SUM(COALESCE(il.LineProfit,    0)) AS ProfitDuringDeals
+  FROM dbo.SalesSpecialDeals AS sd
+
+  /* map item-level deals to groups */
+  LEFT JOIN dbo.StockItemsStockGroups AS sisg
+    ON sisg.StockItemID = sd.StockItemID
+
+  /* determine group: bridge if present, else deal’s own GroupID */
+  JOIN dbo.WarehouseStockGroups AS grp
+    ON grp.StockGroupID = COALESCE(sisg.StockGroupID, sd.StockGroupID)
+
+  /* pull every sale for any item in that group */
+  LEFT JOIN dbo.StockItemsStockGroups AS sisg2
+    ON sisg2.StockGroupID = grp.StockGroupID
+  LEFT JOIN dbo.SalesInvoiceLines       AS il
+    ON il.StockItemID = sisg2.StockItemID
+   AND il.LastEditedWhen >= @StartDate
+   AND il.LastEditedWhen <= @EndDate
+
+  /* only deals running at some point inside the window */
+  WHERE sd.StartDate <= @EndDate
+    AND sd.EndDate   >= @StartDate
+
+  GROUP BY
+    grp.StockGroupID,
+    grp.StockGroupName
+  ORDER BY
+    ActiveDeals DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_PromoPerformanceByBuyingGroup_Legacy
+AS
+BEGIN
+  SET NOCOUNT ON;
+
+  SELECT
+    bg.BuyingGroupID,
+    bg.BuyingGroupName,
+    grp.StockGroupID,
+    grp.StockGroupName,
+    COUNT(DISTINCT sd.SpecialDealID)    AS DealCount,
+    AVG(sd.DiscountPercentage)         AS AvgDiscountPct,
+    SUM(COALESCE(il.ExtendedPrice, 0)) AS SalesDuringDeals,
+    SUM(COALESCE(il.LineProfit,    0)) AS ProfitDuringDeals
+  FROM dbo.SalesSpecialDeals AS sd
+  JOIN dbo.SalesBuyingGroups       AS bg
+    ON bg.BuyingGroupID = sd.BuyingGroupID
+
+  LEFT JOIN dbo.StockItemsStockGroups AS sisg
+    ON sisg.StockItemID = sd.StockItemID
+
+  JOIN dbo.WarehouseStockGroups AS grp
+    ON grp.StockGroupID = COALESCE(sisg.StockGroupID, sd.StockGroupID)
+
+  LEFT JOIN dbo.StockItemsStockGroups AS sisg2
+    ON sisg2.StockGroupID = grp.StockGroupID
+
+  LEFT JOIN dbo.SalesInvoiceLines AS il
+    ON il.StockItemID = sisg2.StockItemID
+
+  GROUP BY
+    bg.BuyingGroupID,
+    bg.BuyingGroupName,
+    grp.StockGroupID,
+    grp.StockGroupName
+  ORDER BY
+    SalesDuringDeals DESC;
+END;
+GO
@@ -0,0 +1,280 @@
+USE project4;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  Analytics star schema (dw) over the copied WideWorldImporters tables.
+
+  Dimensions are small rowstore tables keyed on the WWI ids; the three
+  fact tables are clustered columnstores loaded in date order, so the
+  KPI aggregates read compressed segments in batch mode and date ranges
+  eliminate whole row groups. Reload with EXEC dw.usp_LoadStarSchema.
+──────────────────────────────────────────────────────────────────────*/
+IF SCHEMA_ID('dw') IS NULL
+  EXEC('CREATE SCHEMA dw');
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  1. Dimensions
+──────────────────────────────────────────────────────────────────────*/
+IF OBJECT_ID('dw.DimDate','U') IS NULL
+CREATE TABLE dw.DimDate (
+  DateKey     INT      NOT NULL CONSTRAINT PK_DimDate PRIMARY KEY,  -- yyyymmdd
+  [Date]      DATE     NOT NULL,
+  [Year]      SMALLINT NOT NULL,
+  [Quarter]   TINYINT  NOT NULL,
+  [Month]     TINYINT  NOT NULL,
+  MonthStart  DATE     NOT NULL
+);
+GO
+
+IF OBJECT_ID('dw.DimStockItem','U') IS NULL
+CREATE TABLE dw.DimStockItem (
+  StockItemID   INT           NOT NULL CONSTRAINT PK_DimStockItem PRIMARY KEY,
+  StockItemName NVARCHAR(100) NOT NULL
+);
+GO
+
+IF OBJECT_ID('dw.DimStockGroup','U') IS NULL
+CREATE TABLE dw.DimStockGroup (
+  StockGroupID   INT          NOT NULL CONSTRAINT PK_DimStockGroup PRIMARY KEY,
+  StockGroupName NVARCHAR(50) NOT NULL
+);
+GO
+
+-- Items belong to several groups, so the item -> group mapping is a bridge
+IF OBJECT_ID('dw.BridgeStockItemGroup','U') IS NULL
+CREATE TABLE dw.BridgeStockItemGroup (
+  StockItemID  INT NOT NULL,
+  StockGroupID INT NOT NULL,
+  CONSTRAINT PK_BridgeStockItemGroup PRIMARY KEY (StockItemID, StockGroupID)
+);
+GO
+
+IF OBJECT_ID('dw.DimCustomer','U') IS NULL
+CREATE TABLE dw.DimCustomer (
+  CustomerID           INT           NOT NULL CONSTRAINT PK_DimCustomer PRIMARY KEY,
+  CustomerName         NVARCHAR(100) NOT NULL,
+  CustomerCategoryName NVARCHAR(50)  NULL,
+  BuyingGroupID        INT           NULL,
+  CountryID            INT           NULL,
+  CountryName          NVARCHAR(60)  NULL
+);
+GO
+
+IF OBJECT_ID('dw.DimSupplier','U') IS NULL
+CREATE TABLE dw.DimSupplier (
+  SupplierID   INT           NOT NULL CONSTRAINT PK_DimSupplier PRIMARY KEY,
+  SupplierName NVARCHAR(100) NOT NULL
+);
+GO
+
+IF OBJECT_ID('dw.DimTransactionType','U') IS NULL
+CREATE TABLE dw.DimTransactionType (
+  TransactionTypeID   INT          NOT NULL CONSTRAINT PK_DimTransactionType PRIMARY KEY,
+  TransactionTypeName NVARCHAR(50) NOT NULL
+);
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  2. Facts (clustered columnstore)
+──────────────────────────────────────────────────────────────────────*/
+IF OBJECT_ID('dw.FactInvoiceLine','U') IS NULL
+CREATE TABLE dw.FactInvoiceLine (
+  InvoiceLineID  INT            NOT NULL,
+  InvoiceID      INT            NOT NULL,
+  DateKey        INT            NOT NULL,
+  LastEditedWhen DATETIME2(7)   NOT NULL,
+  StockItemID    INT            NOT NULL,
+  CustomerID     INT            NULL,
+  Quantity       INT            NOT NULL,
+  ExtendedPrice  DECIMAL(18,2)  NOT NULL,
+  LineProfit     DECIMAL(18,2)  NOT NULL,
+  TaxRate        DECIMAL(18,3)  NOT NULL,
+  TaxAmount      DECIMAL(18,2)  NOT NULL,
+  INDEX CCI_FactInvoiceLine CLUSTERED COLUMNSTORE
+);
+GO
+
+IF OBJECT_ID('dw.FactPurchaseOrderLine','U') IS NULL
+CREATE TABLE dw.FactPurchaseOrderLine (
+  PurchaseOrderLineID       INT           NOT NULL,
+  PurchaseOrderID           INT           NOT NULL,
+  DateKey                   INT           NULL,      -- no receipt yet
+  LastReceiptDate           DATE          NULL,
+  StockItemID               INT           NOT NULL,
+  SupplierID                INT           NOT NULL,
+  OrderedOuters             INT           NOT NULL,
+  ExpectedUnitPricePerOuter DECIMAL(18,2) NULL,
+  PurchaseAmount            DECIMAL(18,2) NULL,      -- ExpectedUnitPricePerOuter * OrderedOuters
+  INDEX CCI_FactPurchaseOrderLine CLUSTERED COLUMNSTORE
+);
+GO
+
+IF OBJECT_ID('dw.FactStockTransaction','U') IS NULL
+CREATE TABLE dw.FactStockTransaction (
+  StockItemTransactionID  INT           NOT NULL,
+  DateKey                 INT           NOT NULL,
+  TransactionOccurredWhen DATETIME2(7)  NOT NULL,
+  TransactionTypeID       INT           NOT NULL,
+  StockItemID             INT           NOT NULL,
+  CustomerID              INT           NULL,
+  SupplierID              INT           NULL,
+  Quantity                DECIMAL(18,3) NOT NULL,
+  INDEX CCI_FactStockTransaction CLUSTERED COLUMNSTORE
+);
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  3. Full reload from the dbo copies
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dw.usp_LoadStarSchema
+AS
+BEGIN
+  SET NOCOUNT ON;
+  SET XACT_ABORT ON;
+
+  BEGIN TRANSACTION;
+
+  TRUNCATE TABLE dw.FactInvoiceLine;
+  TRUNCATE TABLE dw.FactPurchaseOrderLine;
+  TRUNCATE TABLE dw.FactStockTransaction;
+  TRUNCATE TABLE dw.BridgeStockItemGroup;
+  DELETE FROM dw.DimDate;
+  DELETE FROM dw.DimStockItem;
+  DELETE FROM dw.DimStockGroup;
+  DELETE FROM dw.DimCustomer;
+  DELETE FROM dw.DimSupplier;
+  DELETE FROM dw.DimTransactionType;
+
+  /* one row per day across every fact date */
+  DECLARE @FirstDay DATE = (
+    SELECT MIN(d) FROM (
+      SELECT CAST(MIN(LastEditedWhen) AS DATE) FROM dbo.SalesInvoiceLines
+      UNION ALL SELECT MIN(LastReceiptDate) FROM dbo.PurchaseOrderLines
+      UNION ALL SELECT CAST(MIN(TransactionOccurredWhen) AS DATE) FROM dbo.StockItemTransactions
+    ) AS x(d));
+  DECLARE @LastDay DATE = (
+    SELECT MAX(d) FROM (
+      SELECT CAST(MAX(LastEditedWhen) AS DATE) FROM dbo.SalesInvoiceLines
+      UNION ALL SELECT MAX(LastReceiptDate) FROM dbo.PurchaseOrderLines
+      UNION ALL SELECT CAST(MAX(TransactionOccurredWhen) AS DATE) FROM dbo.StockItemTransactions
+    ) AS x(d));
+
+  ;WITH Days AS (
+    SELECT TOP (DATEDIFF(day, @FirstDay, @LastDay) + 1)
+      DATEADD(day, ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1, @FirstDay) AS d
+    FROM sys.all_objects a CROSS JOIN sys.all_objects b
+  )
+  INSERT INTO dw.DimDate (DateKey, [Date], [Year], [Quarter], [Month], MonthStart)
+  SELECT
+    CONVERT(INT, CONVERT(CHAR(8), d, 112)),
+    d,
+    YEAR(d),
+    DATEPART(quarter, d),
+    MONTH(d),
+    DATEFROMPARTS(YEAR(d), MONTH(d), 1)
+  FROM Days;
+
+  INSERT INTO dw.DimStockItem (StockItemID, StockItemName)
+  SELECT StockItemID, StockItemName FROM dbo.WarehouseStockItem;
+
+  INSERT INTO dw.DimStockGroup (StockGroupID, StockGroupName)
+  SELECT StockGroupID, StockGroupName FROM dbo.WarehouseStockGroups;
+
+  INSERT INTO dw.BridgeStockItemGroup (StockItemID, StockGroupID)
+  SELECT DISTINCT StockItemID, StockGroupID FROM dbo.StockItemsStockGroups;
+
+  INSERT INTO dw.DimCustomer
+    (CustomerID, CustomerName, CustomerCategoryName, BuyingGroupID, CountryID, CountryName)
+  SELECT
+    c.CustomerID,
+    c.CustomerName,
+    cc.CustomerCategoryName,
+    c.BuyingGroupID,
+    cn.CountryID,
+    cn.CountryName
+  FROM dbo.SalesCustomers AS c
+  LEFT JOIN dbo.SalesCustomersCategories AS cc
+    ON cc.CustomerCategoryID = c.CustomerCategoryID
+  LEFT JOIN dbo.ApplicationCities AS city
+    ON city.CityID = c.DeliveryCityID
+  LEFT JOIN dbo.ApplicationStatesProvinces AS sp
+    ON sp.StateProvinceID = city.StateProvinceID
+  LEFT JOIN dbo.ApplicationCountries AS cn
+    ON cn.CountryID = sp.CountryID;
+
+  INSERT INTO dw.DimSupplier (SupplierID, SupplierName)
+  SELECT SupplierID, SupplierName FROM dbo.PurchasingSuppliers;
+
+  INSERT INTO dw.DimTransactionType (TransactionTypeID, TransactionTypeName)
+  SELECT TransactionTypeID, TransactionTypeName FROM dbo.ApplicationTransactionTypes;
+
+  /* facts go in date order on one thread so row groups cover
+     contiguous date ranges and range filters skip whole segments */
+  INSERT INTO dw.FactInvoiceLine WITH (TABLOCK)
+    (InvoiceLineID, InvoiceID, DateKey, LastEditedWhen, StockItemID, CustomerID,
+     Quantity, ExtendedPrice, LineProfit, TaxRate, TaxAmount)
+  SELECT
+    il.InvoiceLineID,
+    il.InvoiceID,
+    CONVERT(INT, CONVERT(CHAR(8), il.LastEditedWhen, 112)),
+    il.LastEditedWhen,
+    il.StockItemID,
+    si.CustomerID,
+    il.Quantity,
+    il.ExtendedPrice,
+    il.LineProfit,
+    il.TaxRate,
+    il.TaxAmount
+  FROM dbo.SalesInvoiceLines AS il
+  LEFT JOIN dbo.SalesInvoices AS si
+    ON si.InvoiceID = il.InvoiceID
+  ORDER BY il.LastEditedWhen
+  OPTION (MAXDOP 1);
+
+  INSERT INTO dw.FactPurchaseOrderLine WITH (TABLOCK)
+    (PurchaseOrderLineID, PurchaseOrderID, DateKey, LastReceiptDate, StockItemID,
+     SupplierID, OrderedOuters, ExpectedUnitPricePerOuter, PurchaseAmount)
+  SELECT
+    pol.PurchaseOrderLineID,
+    pol.PurchaseOrderID,
+    CONVERT(INT, CONVERT(CHAR(8), pol.LastReceiptDate, 112)),
+    pol.LastReceiptDate,
+    pol.StockItemID,
+    po.SupplierID,
+    pol.OrderedOuters,
+    pol.ExpectedUnitPricePerOuter,
+    pol.ExpectedUnitPricePerOuter * pol.OrderedOuters
+  FROM dbo.PurchaseOrderLines AS pol
+  JOIN dbo.PurchaseOrders AS po
+    ON po.PurchaseOrderID = pol.PurchaseOrderID
+  ORDER BY pol.LastReceiptDate
+  OPTION (MAXDOP 1);
+
+  INSERT INTO dw.FactStockTransaction WITH (TABLOCK)
+    (StockItemTransactionID, DateKey, TransactionOccurredWhen, TransactionTypeID,
+     StockItemID, CustomerID, SupplierID, Quantity)
+  SELECT
+    StockItemTransactionID,
+    CONVERT(INT, CONVERT(CHAR(8), TransactionOccurredWhen, 112)),
+    TransactionOccurredWhen,
+    TransactionTypeID,
+    StockItemID,
+    CustomerID,
+    SupplierID,
+    Quantity
+  FROM dbo.StockItemTransactions
+  ORDER BY TransactionOccurredWhen
+  OPTION (MAXDOP 1);
+
+  COMMIT TRANSACTION;
+
+  /* close the trailing open delta stores so every row is in a compressed segment */
+  ALTER INDEX CCI_FactInvoiceLine       ON dw.FactInvoiceLine       REORGANIZE WITH (COMPRESS_ALL_ROW_GROUPS = ON);
+  ALTER INDEX CCI_FactPurchaseOrderLine ON dw.FactPurchaseOrderLine REORGANIZE WITH (COMPRESS_ALL_ROW_GROUPS = ON);
+  ALTER INDEX CCI_FactStockTransaction  ON dw.FactStockTransaction  REORGANIZE WITH (COMPRESS_ALL_ROW_GROUPS = ON);
+END;
+GO
+
+EXEC dw.usp_LoadStarSchema;
+GO
@@ -0,0 +1,562 @@
+USE project4;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  KPI procedures re-pointed at the dw star schema (SQLQuery34.sql).
+
+  Same names, parameters and result shapes as SQLQuery11/29/31, but the
+  invoice-line, PO-line and stock-transaction reads hit the clustered
+  columnstore facts. Procedures that only touch deals and lookups
+  (DealCoverage, MostDiscountedClients, PromoDealsByStockGroup) are
+  unchanged. Run after SQLQuery34.sql; re-running the older scripts
+  points the procedures back at the dbo rowstore copies.
+──────────────────────────────────────────────────────────────────────*/
+
+/*──────────────────────────────────────────────────────────────────────
+  1. Sales vs purchases, gross profit, COGS
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_SalesVsPurchases
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+  DECLARE
+    @StartKey INT = CONVERT(INT, CONVERT(CHAR(8), @StartDate, 112)),
+    @EndKey   INT = CONVERT(INT, CONVERT(CHAR(8), @EndDate,   112));
+
+  SELECT
+    (SELECT SUM(ExtendedPrice)
+     FROM dw.FactInvoiceLine
+     WHERE LastEditedWhen >= @StartDate
+       AND LastEditedWhen <= @EndDate
+    ) AS TotalSales,
+    (SELECT SUM(PurchaseAmount)
+     FROM dw.FactPurchaseOrderLine
+     WHERE DateKey >= @StartKey
+       AND DateKey <= @EndKey
+    ) AS TotalPurchases
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_GrossProfit
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    SUM(LineProfit)   AS TotalProfit,
+    SUM(ExtendedPrice) AS TotalRevenue,
+    (SUM(LineProfit)*1.0)/NULLIF(SUM(ExtendedPrice),0) AS GrossMarginPct
+  FROM dw.FactInvoiceLine
+  WHERE LastEditedWhen >= @StartDate
+    AND LastEditedWhen <= @EndDate
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_COGSvsPurchases
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+  DECLARE
+    @StartKey INT = CONVERT(INT, CONVERT(CHAR(8), @StartDate, 112)),
+    @EndKey   INT = CONVERT(INT, CONVERT(CHAR(8), @EndDate,   112));
+
+  SELECT
+    SUM(ExtendedPrice - LineProfit) AS COGS,
+    (SELECT SUM(PurchaseAmount)
+     FROM dw.FactPurchaseOrderLine
+     WHERE DateKey >= @StartKey
+       AND DateKey <= @EndKey) AS TotalPurchases
+  FROM dw.FactInvoiceLine
+  WHERE LastEditedWhen >= @StartDate
+    AND LastEditedWhen <= @EndDate
+  OPTION (RECOMPILE);
+END;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  2. Product margins, tax variance, sales by stock group
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_AvgMarginPerProductWithGroup
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    si.StockItemID,
+    si.StockItemName,
+    sg.StockGroupID,
+    sg.StockGroupName,
+    AVG(il.LineProfit)           AS AvgMargin,
+    COUNT(DISTINCT il.InvoiceID) AS InvoiceCount,
+    SUM(il.LineProfit)           AS TotalProfit,
+    SUM(il.ExtendedPrice)        AS TotalRevenue,
+    ROUND(
+      SUM(il.LineProfit)*1.0
+      / NULLIF(SUM(il.ExtendedPrice),0)
+      * 100,2
+    )                           AS MarginPct
+  FROM dw.FactInvoiceLine AS il
+  JOIN dw.DimStockItem AS si
+    ON si.StockItemID = il.StockItemID
+  LEFT JOIN dw.BridgeStockItemGroup AS sisg
+    ON sisg.StockItemID = si.StockItemID
+  LEFT JOIN dw.DimStockGroup AS sg
+    ON sg.StockGroupID = sisg.StockGroupID
+  WHERE il.LastEditedWhen >= @StartDate
+    AND il.LastEditedWhen <= @EndDate
+  GROUP BY
+    si.StockItemID,
+    si.StockItemName,
+    sg.StockGroupID,
+    sg.StockGroupName
+  ORDER BY AvgMargin DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_SupposedTaxAmount
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    il.InvoiceLineID,
+    il.InvoiceID,
+    il.ExtendedPrice     AS LineTotalWithTax,
+    il.TaxRate,
+    il.TaxAmount         AS RecordedTaxAmount,
+    -- back-calculate expected tax from the stored line total:
+    ROUND(
+      il.ExtendedPrice
+      * (il.TaxRate / (100.0 + il.TaxRate))
+    ,2)                  AS ExpectedTaxAmount,
+    il.TaxAmount
+      - ROUND(
+          il.ExtendedPrice
+          * (il.TaxRate / (100.0 + il.TaxRate))
+        ,2)
+      AS TaxVariance
+  FROM dw.FactInvoiceLine il
+  WHERE il.LastEditedWhen >= @StartDate
+    AND il.LastEditedWhen <= @EndDate
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_SalesByStockGroup
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL,
+  @CountryID INT      = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  /* CustomerID and the customer's country are already on the fact/dimension,
+     so the SalesInvoices and geography joins collapse into DimCustomer */
+  SELECT
+    sg.StockGroupID,
+    sg.StockGroupName,
+    c.CountryName,
+    SUM(il.Quantity)      AS TotalUnitsSold,
+    SUM(il.LineProfit)    AS TotalProfit,
+    SUM(il.ExtendedPrice) AS TotalRevenue,
+    ROUND(
+      SUM(il.LineProfit)*1.0
+      / NULLIF(SUM(il.ExtendedPrice),0)
+      * 100,2
+    )                     AS GrossMarginPct
+  FROM dw.FactInvoiceLine AS il
+  JOIN dw.BridgeStockItemGroup AS sisg
+    ON sisg.StockItemID = il.StockItemID
+  JOIN dw.DimStockGroup AS sg
+    ON sg.StockGroupID = sisg.StockGroupID
+  LEFT JOIN dw.DimCustomer AS c
+    ON c.CustomerID = il.CustomerID
+  WHERE il.LastEditedWhen >= @StartDate
+    AND il.LastEditedWhen <= @EndDate
+    AND (@CountryID IS NULL OR c.CountryID = @CountryID)
+  GROUP BY
+    sg.StockGroupID,
+    sg.StockGroupName,
+    c.CountryName
+  ORDER BY
+    TotalUnitsSold DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  3. Stock transactions: movement, type distribution, suppliers, segments
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_StockMovementVolume
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    SUM(Quantity) AS TotalMovementVolume
+  FROM dw.FactStockTransaction
+  WHERE TransactionOccurredWhen >= @StartDate
+    AND TransactionOccurredWhen <= @EndDate
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_TransactionDistribution
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    tt.TransactionTypeName,
+    COUNT(*)                        AS TxnCount,
+    COUNT(*)*100.0/SUM(COUNT(*)) OVER() AS PctShare
+  FROM dw.FactStockTransaction sit
+  JOIN dw.DimTransactionType tt
+    ON tt.TransactionTypeID = sit.TransactionTypeID
+  WHERE
+    sit.TransactionOccurredWhen >= @StartDate
+    AND sit.TransactionOccurredWhen <= @EndDate
+  GROUP BY tt.TransactionTypeName
+  ORDER BY TxnCount DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_SupplierPerformance
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  ;WITH Receipts AS (
+    SELECT
+      sit.SupplierID,
+      sit.TransactionOccurredWhen AS ReceiptDate,
+      sit.Quantity
+    FROM dw.FactStockTransaction sit
+    JOIN dw.DimTransactionType tt
+      ON tt.TransactionTypeID = sit.TransactionTypeID
+    WHERE
+      tt.TransactionTypeName = 'Stock Receipt'
+      AND sit.SupplierID IS NOT NULL
+      AND sit.TransactionOccurredWhen >= @StartDate
+      AND sit.TransactionOccurredWhen <= @EndDate
+  ),
+  Numbered AS (
+    SELECT
+      SupplierID,
+      Quantity,
+      ReceiptDate,
+      LAG(ReceiptDate) OVER(
+        PARTITION BY SupplierID ORDER BY ReceiptDate
+      ) AS PrevReceipt
+    FROM Receipts
+  )
+  SELECT
+    s.SupplierID,
+    sp.SupplierName,
+    COUNT(*)                         AS ReceiptEvents,
+    SUM(s.Quantity)                 AS TotalQtyReceived,
+    AVG(DATEDIFF(day, s.PrevReceipt, s.ReceiptDate)) AS AvgDaysBetweenReceipts
+  FROM Numbered s
+  JOIN dw.DimSupplier sp
+    ON sp.SupplierID = s.SupplierID
+  GROUP BY
+    s.SupplierID,
+    sp.SupplierName
+  ORDER BY TotalQtyReceived DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_CustomerSegmentSales
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    c.CustomerCategoryName,
+    COUNT(DISTINCT sit.CustomerID)    AS Customers,
+    COUNT(*)                          AS ShipmentEvents,
+    SUM(ABS(sit.Quantity))            AS TotalQtyShipped
+  FROM dw.FactStockTransaction sit
+  JOIN dw.DimCustomer c
+    ON c.CustomerID = sit.CustomerID
+  WHERE sit.CustomerID IS NOT NULL
+    AND c.CustomerCategoryName IS NOT NULL
+    AND sit.TransactionTypeID = 10    -- Stock Issue
+    AND sit.TransactionOccurredWhen >= @StartDate
+    AND sit.TransactionOccurredWhen <= @EndDate
+  GROUP BY c.CustomerCategoryName
+  ORDER BY TotalQtyShipped DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  4. Product imbalance
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_ProductImbalance_SingleRow
+    @StartDate DATETIME = NULL,
+    @EndDate   DATETIME = NULL,
+    @TopN      INT      = 10
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+  DECLARE
+    @StartKey INT = CONVERT(INT, CONVERT(CHAR(8), @StartDate, 112)),
+    @EndKey   INT = CONVERT(INT, CONVERT(CHAR(8), @EndDate,   112));
+
+  ;WITH
+  Sales AS (
+    SELECT StockItemID, SUM(Quantity) AS QtySold
+    FROM dw.FactInvoiceLine
+    WHERE LastEditedWhen >= @StartDate
+      AND LastEditedWhen <= @EndDate
+    GROUP BY StockItemID
+  ),
+  Purch AS (
+    SELECT
+      StockItemID,
+      SupplierID,
+      SUM(OrderedOuters) AS QtyPurchased
+    FROM dw.FactPurchaseOrderLine
+    WHERE DateKey >= @StartKey
+      AND DateKey <= @EndKey
+    GROUP BY StockItemID, SupplierID
+  ),
+  Imb AS (
+    SELECT
+      pur.StockItemID,
+      pur.SupplierID,
+      COALESCE(pur.QtyPurchased,0) AS QtyPurchased,
+      COALESCE(sal.QtySold,0)       AS QtySold,
+      COALESCE(pur.QtyPurchased,0) - COALESCE(sal.QtySold,0) AS NetBuildUp,
+      CASE
+        WHEN COALESCE(sal.QtySold,0)=0 THEN NULL
+        ELSE CAST(pur.QtyPurchased AS FLOAT)/sal.QtySold
+      END AS PurchaseToSalesRatio
+    FROM Purch pur
+    LEFT JOIN Sales sal
+      ON sal.StockItemID = pur.StockItemID
+  )
+  SELECT TOP(@TopN)
+    i.StockItemID,
+    si.StockItemName,
+    STRING_AGG(sg.StockGroupName, ', ')
+      WITHIN GROUP (ORDER BY sg.StockGroupName)
+      AS StockGroupNames,
+    i.SupplierID,
+    sup.SupplierName,
+    i.QtyPurchased,
+    i.QtySold,
+    i.NetBuildUp,
+    i.PurchaseToSalesRatio
+  FROM Imb i
+  JOIN dw.DimStockItem si
+    ON si.StockItemID = i.StockItemID
+  JOIN dw.DimSupplier sup
+    ON sup.SupplierID = i.SupplierID
+  LEFT JOIN dw.BridgeStockItemGroup sisg
+    ON sisg.StockItemID = i.StockItemID
+  LEFT JOIN dw.DimStockGroup sg
+    ON sg.StockGroupID = sisg.StockGroupID
+  GROUP BY
+    i.StockItemID,
+    si.StockItemName,
+    i.SupplierID,
+    sup.SupplierName,
+    i.QtyPurchased,
+    i.QtySold,
+    i.NetBuildUp,
+    i.PurchaseToSalesRatio
+  ORDER BY
+    NetBuildUp DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  5. Promotions (deals stay in dbo; only the sales side moves)
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_PromoPerformance
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  ;WITH GroupSales AS (
+    SELECT
+      sisg.StockGroupID,
+      SUM(il.ExtendedPrice) AS Sales,
+      SUM(il.LineProfit)    AS Profit
+    FROM dw.FactInvoiceLine AS il
+    JOIN dw.BridgeStockItemGroup AS sisg
+      ON sisg.StockItemID = il.StockItemID
+    WHERE il.LastEditedWhen >= @StartDate
+      AND il.LastEditedWhen <= @EndDate
+    GROUP BY sisg.StockGroupID
+  ),
+  /* one row per deal and group: bridge if present, else deal’s own GroupID */
+  DealGroups AS (
+    SELECT DISTINCT
+      sd.SpecialDealID,
+      sd.DiscountPercentage,
+      COALESCE(sisg.StockGroupID, sd.StockGroupID) AS StockGroupID
+    FROM dbo.SalesSpecialDeals AS sd
+    LEFT JOIN dw.BridgeStockItemGroup AS sisg
+      ON sisg.StockItemID = sd.StockItemID
+    /* only deals running at some point inside the window */
+    WHERE sd.StartDate <= @EndDate
+      AND sd.EndDate   >= @StartDate
+  ),
+  GroupDeals AS (
+    SELECT
+      StockGroupID,
+      COUNT(*)                AS ActiveDeals,
+      AVG(DiscountPercentage) AS AvgDiscountPct,
+      MAX(DiscountPercentage) AS MaxDiscountPct
+    FROM DealGroups
+    GROUP BY StockGroupID
+  )
+  SELECT
+    grp.StockGroupID,
+    grp.StockGroupName,
+    gd.ActiveDeals,
+    gd.AvgDiscountPct,
+    gd.MaxDiscountPct,
+    COALESCE(gs.Sales,  0) AS SalesDuringDeals,
+    COALESCE(gs.Profit, 0) AS ProfitDuringDeals
+  FROM GroupDeals AS gd
+  JOIN dw.DimStockGroup AS grp
+    ON grp.StockGroupID = gd.StockGroupID
+  LEFT JOIN GroupSales AS gs
+    ON gs.StockGroupID = gd.StockGroupID
+  ORDER BY
+    ActiveDeals DESC
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_PromoPerformanceByBuyingGroup
+  @StartDate DATETIME = NULL,
+  @EndDate   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  ;WITH GroupSales AS (
+    SELECT
+      sisg.StockGroupID,
+      SUM(il.ExtendedPrice) AS Sales,
+      SUM(il.LineProfit)    AS Profit
+    FROM dw.FactInvoiceLine AS il
+    JOIN dw.BridgeStockItemGroup AS sisg
+      ON sisg.StockItemID = il.StockItemID
+    WHERE il.LastEditedWhen >= @StartDate
+      AND il.LastEditedWhen <= @EndDate
+    GROUP BY sisg.StockGroupID
+  ),
+  DealGroups AS (
+    SELECT DISTINCT
+      sd.SpecialDealID,
+      sd.BuyingGroupID,
+      sd.DiscountPercentage,
+      COALESCE(sisg.StockGroupID, sd.StockGroupID) AS StockGroupID
+    FROM dbo.SalesSpecialDeals AS sd
+    LEFT JOIN dw.BridgeStockItemGroup AS sisg
+      ON sisg.StockItemID = sd.StockItemID
+    WHERE sd.BuyingGroupID IS NOT NULL
+      AND sd.StartDate <= @EndDate
+      AND sd.EndDate   >= @StartDate
+  ),
+  BuyingGroupDeals AS (
+    SELECT
+      BuyingGroupID,
+      StockGroupID,
+      COUNT(*)                AS DealCount,
+      AVG(DiscountPercentage) AS AvgDiscountPct
+    FROM DealGroups
+    GROUP BY BuyingGroupID, StockGroupID
+  )
+  SELECT
+    bg.BuyingGroupID,
+    bg.BuyingGroupName,
+    grp.StockGroupID,
+    grp.StockGroupName,
+    bd.DealCount,
+    bd.AvgDiscountPct,
+    COALESCE(gs.Sales,  0) AS SalesDuringDeals,
+    COALESCE(gs.Profit, 0) AS ProfitDuringDeals
+  FROM BuyingGroupDeals AS bd
+  JOIN dbo.SalesBuyingGroups AS bg
+    ON bg.BuyingGroupID = bd.BuyingGroupID
+  JOIN dw.DimStockGroup AS grp
+    ON grp.StockGroupID = bd.StockGroupID
+  LEFT JOIN GroupSales AS gs
+    ON gs.StockGroupID = bd.StockGroupID
+  ORDER BY
+    SalesDuringDeals DESC
+  OPTION (RECOMPILE);
+END;
+GO
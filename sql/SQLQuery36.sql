@@ -0,0 +1,76 @@
+USE project4;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  Pre-drawn samples of the two large dw facts for the dashboard's fast
+  preview (queries.PREVIEW_TOTALS_SQL / PREVIEW_TREND_SQL).
+
+  Each row is kept with probability @Percent / 100 (Bernoulli sampling)
+  and carries Weight = 1 / p, so SUM(x * Weight) estimates SUM(x) over
+  the full fact and SQRT(SUM(Weight * (Weight - 1) * x * x)) is the
+  standard error of that estimate. Run after SQLQuery34.sql, and again
+  after every EXEC dw.usp_LoadStarSchema.
+──────────────────────────────────────────────────────────────────────*/
+
+/*──────────────────────────────────────────────────────────────────────
+  1. Sample tables (rowstore, clustered on the date the previews filter)
+──────────────────────────────────────────────────────────────────────*/
+IF OBJECT_ID('dw.FactInvoiceLineSample','U') IS NULL
+CREATE TABLE dw.FactInvoiceLineSample (
+  InvoiceLineID  INT           NOT NULL,
+  DateKey        INT           NOT NULL,
+  LastEditedWhen DATETIME2(7)  NOT NULL,
+  ExtendedPrice  DECIMAL(18,2) NOT NULL,
+  LineProfit     DECIMAL(18,2) NOT NULL,
+  Weight         FLOAT         NOT NULL,
+  INDEX CIX_FactInvoiceLineSample CLUSTERED (LastEditedWhen)
+);
+GO
+
+IF OBJECT_ID('dw.FactStockTransactionSample','U') IS NULL
+CREATE TABLE dw.FactStockTransactionSample (
+  StockItemTransactionID  INT           NOT NULL,
+  DateKey                 INT           NOT NULL,
+  TransactionOccurredWhen DATETIME2(7)  NOT NULL,
+  Quantity                DECIMAL(18,3) NOT NULL,
+  Weight                  FLOAT         NOT NULL,
+  INDEX CIX_FactStockTransactionSample CLUSTERED (TransactionOccurredWhen)
+);
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  2. Redraw both samples from the facts
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dw.usp_LoadSamples
+  @Percent DECIMAL(5,2) = 1.00
+AS
+BEGIN
+  SET NOCOUNT ON;
+  SET XACT_ABORT ON;
+
+  DECLARE @Weight FLOAT = 100.0 / @Percent;
+
+  BEGIN TRANSACTION;
+
+  TRUNCATE TABLE dw.FactInvoiceLineSample;
+  TRUNCATE TABLE dw.FactStockTransactionSample;
+
+  /* CHECKSUM(NEWID()) is evaluated per row, unlike RAND() */
+  INSERT INTO dw.FactInvoiceLineSample WITH (TABLOCK)
+    (InvoiceLineID, DateKey, LastEditedWhen, ExtendedPrice, LineProfit, Weight)
+  SELECT InvoiceLineID, DateKey, LastEditedWhen, ExtendedPrice, LineProfit, @Weight
+  FROM dw.FactInvoiceLine
+  WHERE ABS(CHECKSUM(NEWID()) % 10000) < @Percent * 100;
+
+  INSERT INTO dw.FactStockTransactionSample WITH (TABLOCK)
+    (StockItemTransactionID, DateKey, TransactionOccurredWhen, Quantity, Weight)
+  SELECT StockItemTransactionID, DateKey, TransactionOccurredWhen, Quantity, @Weight
+  FROM dw.FactStockTransaction
+  WHERE ABS(CHECKSUM(NEWID()) % 10000) < @Percent * 100;
+
+  COMMIT TRANSACTION;
+END;
+GO
+
+EXEC dw.usp_LoadSamples;
+GO
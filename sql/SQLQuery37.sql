@@ -0,0 +1,215 @@
+USE project4;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  Period-over-period versions of the KPI card procedures.
+
+  Each procedure takes an optional comparison window next to its date
+  range and reads the fact once for both: the WHERE clause keeps rows in
+  either window and conditional aggregation splits them into the usual
+  columns plus Prev* columns for the comparison window. Windows may
+  overlap (a year-over-year view of a multi-year range); a row in both
+  counts in both. Without @CompareStart/@CompareEnd the comparison
+  predicates are never true, the Prev* columns are NULL and the current
+  columns are what SQLQuery35.sql returns. Run after SQLQuery35.sql.
+──────────────────────────────────────────────────────────────────────*/
+
+/*──────────────────────────────────────────────────────────────────────
+  1. Sales vs purchases, gross profit, COGS
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_SalesVsPurchases
+  @StartDate    DATETIME = NULL,
+  @EndDate      DATETIME = NULL,
+  @CompareStart DATETIME = NULL,
+  @CompareEnd   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+  DECLARE
+    @StartKey        INT = CONVERT(INT, CONVERT(CHAR(8), @StartDate, 112)),
+    @EndKey          INT = CONVERT(INT, CONVERT(CHAR(8), @EndDate,   112)),
+    @CompareStartKey INT = CONVERT(INT, CONVERT(CHAR(8), @CompareStart, 112)),
+    @CompareEndKey   INT = CONVERT(INT, CONVERT(CHAR(8), @CompareEnd,   112));
+
+  SELECT
+    s.TotalSales,
+    p.TotalPurchases,
+    s.PrevSales,
+    p.PrevPurchases
+  FROM (
+    SELECT
+      SUM(CASE WHEN LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate
+               THEN ExtendedPrice END) AS TotalSales,
+      SUM(CASE WHEN LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd
+               THEN ExtendedPrice END) AS PrevSales
+    FROM dw.FactInvoiceLine
+    WHERE (LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate)
+       OR (LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd)
+  ) s
+  CROSS JOIN (
+    SELECT
+      SUM(CASE WHEN DateKey >= @StartKey AND DateKey <= @EndKey
+               THEN PurchaseAmount END) AS TotalPurchases,
+      SUM(CASE WHEN DateKey >= @CompareStartKey AND DateKey <= @CompareEndKey
+               THEN PurchaseAmount END) AS PrevPurchases
+    FROM dw.FactPurchaseOrderLine
+    WHERE (DateKey >= @StartKey AND DateKey <= @EndKey)
+       OR (DateKey >= @CompareStartKey AND DateKey <= @CompareEndKey)
+  ) p
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_GrossProfit
+  @StartDate    DATETIME = NULL,
+  @EndDate      DATETIME = NULL,
+  @CompareStart DATETIME = NULL,
+  @CompareEnd   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    TotalProfit,
+    TotalRevenue,
+    (TotalProfit*1.0)/NULLIF(TotalRevenue,0) AS GrossMarginPct,
+    PrevProfit,
+    PrevRevenue,
+    (PrevProfit*1.0)/NULLIF(PrevRevenue,0)   AS PrevGrossMarginPct
+  FROM (
+    SELECT
+      SUM(CASE WHEN LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate
+               THEN LineProfit END)    AS TotalProfit,
+      SUM(CASE WHEN LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate
+               THEN ExtendedPrice END) AS TotalRevenue,
+      SUM(CASE WHEN LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd
+               THEN LineProfit END)    AS PrevProfit,
+      SUM(CASE WHEN LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd
+               THEN ExtendedPrice END) AS PrevRevenue
+    FROM dw.FactInvoiceLine
+    WHERE (LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate)
+       OR (LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd)
+  ) t
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_COGSvsPurchases
+  @StartDate    DATETIME = NULL,
+  @EndDate      DATETIME = NULL,
+  @CompareStart DATETIME = NULL,
+  @CompareEnd   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+  DECLARE
+    @StartKey        INT = CONVERT(INT, CONVERT(CHAR(8), @StartDate, 112)),
+    @EndKey          INT = CONVERT(INT, CONVERT(CHAR(8), @EndDate,   112)),
+    @CompareStartKey INT = CONVERT(INT, CONVERT(CHAR(8), @CompareStart, 112)),
+    @CompareEndKey   INT = CONVERT(INT, CONVERT(CHAR(8), @CompareEnd,   112));
+
+  SELECT
+    c.COGS,
+    p.TotalPurchases,
+    c.PrevCOGS,
+    p.PrevPurchases
+  FROM (
+    SELECT
+      SUM(CASE WHEN LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate
+               THEN ExtendedPrice - LineProfit END) AS COGS,
+      SUM(CASE WHEN LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd
+               THEN ExtendedPrice - LineProfit END) AS PrevCOGS
+    FROM dw.FactInvoiceLine
+    WHERE (LastEditedWhen >= @StartDate AND LastEditedWhen <= @EndDate)
+       OR (LastEditedWhen >= @CompareStart AND LastEditedWhen <= @CompareEnd)
+  ) c
+  CROSS JOIN (
+    SELECT
+      SUM(CASE WHEN DateKey >= @StartKey AND DateKey <= @EndKey
+               THEN PurchaseAmount END) AS TotalPurchases,
+      SUM(CASE WHEN DateKey >= @CompareStartKey AND DateKey <= @CompareEndKey
+               THEN PurchaseAmount END) AS PrevPurchases
+    FROM dw.FactPurchaseOrderLine
+    WHERE (DateKey >= @StartKey AND DateKey <= @EndKey)
+       OR (DateKey >= @CompareStartKey AND DateKey <= @CompareEndKey)
+  ) p
+  OPTION (RECOMPILE);
+END;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  2. Stock movement and transaction mix
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_StockMovementVolume
+  @StartDate    DATETIME = NULL,
+  @EndDate      DATETIME = NULL,
+  @CompareStart DATETIME = NULL,
+  @CompareEnd   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    SUM(CASE WHEN TransactionOccurredWhen >= @StartDate AND TransactionOccurredWhen <= @EndDate
+             THEN Quantity END) AS TotalMovementVolume,
+    SUM(CASE WHEN TransactionOccurredWhen >= @CompareStart AND TransactionOccurredWhen <= @CompareEnd
+             THEN Quantity END) AS PrevMovementVolume
+  FROM dw.FactStockTransaction
+  WHERE (TransactionOccurredWhen >= @StartDate AND TransactionOccurredWhen <= @EndDate)
+     OR (TransactionOccurredWhen >= @CompareStart AND TransactionOccurredWhen <= @CompareEnd)
+  OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_TransactionDistribution
+  @StartDate    DATETIME = NULL,
+  @EndDate      DATETIME = NULL,
+  @CompareStart DATETIME = NULL,
+  @CompareEnd   DATETIME = NULL
+AS
+BEGIN
+  SET NOCOUNT ON;
+  /* open-ended bounds become literal limits so range predicates stay sargable */
+  SET @StartDate = COALESCE(@StartDate, '17530101');
+  SET @EndDate   = COALESCE(@EndDate,   '99991231');
+
+  SELECT
+    TransactionTypeName,
+    TxnCount,
+    TxnCount*100.0/NULLIF(SUM(TxnCount) OVER(),0) AS PctShare,
+    PrevTxnCount
+  FROM (
+    SELECT
+      tt.TransactionTypeName,
+      SUM(CASE WHEN sit.TransactionOccurredWhen >= @StartDate
+                AND sit.TransactionOccurredWhen <= @EndDate
+               THEN 1 ELSE 0 END) AS TxnCount,
+      SUM(CASE WHEN sit.TransactionOccurredWhen >= @CompareStart
+                AND sit.TransactionOccurredWhen <= @CompareEnd
+               THEN 1 ELSE 0 END) AS PrevTxnCount
+    FROM dw.FactStockTransaction sit
+    JOIN dw.DimTransactionType tt
+      ON tt.TransactionTypeID = sit.TransactionTypeID
+    WHERE
+      (sit.TransactionOccurredWhen >= @StartDate
+       AND sit.TransactionOccurredWhen <= @EndDate)
+      OR (sit.TransactionOccurredWhen >= @CompareStart
+          AND sit.TransactionOccurredWhen <= @CompareEnd)
+    GROUP BY tt.TransactionTypeName
+  ) t
+  ORDER BY TxnCount DESC
+  OPTION (RECOMPILE);
+END;
+GO
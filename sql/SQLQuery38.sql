@@ -0,0 +1,62 @@
+USE project4;
+GO
+
+/*──────────────────────────────────────────────────────────────────────
+  Source-version probe for the dashboard's result fingerprints.
+
+  One metadata-only call that returns a version string per KPI
+  procedure and per dbo/dw table. A table's version combines its
+  definition date, row count and last user write; a procedure's
+  version combines its own definition date with the versions of every
+  table it references (sys.sql_expression_dependencies). The dashboard
+  refetches a KPI only when its procedure's version, or its
+  parameters, changed since the frame it holds was fetched.
+
+  last_user_update is kept in memory and resets when the database
+  restarts, which only costs one extra refetch. EXECUTE AS OWNER lets
+  the dashboard login read the DMVs without VIEW DATABASE STATE.
+──────────────────────────────────────────────────────────────────────*/
+CREATE OR ALTER PROCEDURE dbo.usp_KPI_SourceVersions
+WITH EXECUTE AS OWNER
+AS
+BEGIN
+  SET NOCOUNT ON;
+
+  WITH TableVersions AS (
+    SELECT
+      o.object_id,
+      CONCAT(SCHEMA_NAME(o.schema_id), '.', o.name) AS ObjectName,
+      CONCAT(
+        CONVERT(VARCHAR(27), o.modify_date, 126), '/',
+        (SELECT SUM(p.row_count)
+         FROM sys.dm_db_partition_stats p
+         WHERE p.object_id = o.object_id
+           AND p.index_id IN (0, 1)), '/',
+        (SELECT CONVERT(VARCHAR(27), MAX(u.last_user_update), 126)
+         FROM sys.dm_db_index_usage_stats u
+         WHERE u.database_id = DB_ID()
+           AND u.object_id = o.object_id)
+      ) AS Version
+    FROM sys.objects o
+    WHERE o.type = 'U'
+      AND SCHEMA_NAME(o.schema_id) IN ('dbo', 'dw')
+  )
+  SELECT ObjectName, Version
+  FROM TableVersions
+  UNION ALL
+  SELECT
+    CONCAT(SCHEMA_NAME(o.schema_id), '.', o.name) AS ObjectName,
+    CONCAT(
+      CONVERT(VARCHAR(27), o.modify_date, 126), '/',
+      CONVERT(VARCHAR(64), HASHBYTES('SHA2_256',
+        (SELECT STRING_AGG(CONCAT(t.ObjectName, '=', t.Version), '|')
+                  WITHIN GROUP (ORDER BY t.ObjectName)
+         FROM sys.sql_expression_dependencies d
+         JOIN TableVersions t ON t.object_id = d.referenced_id
+         WHERE d.referencing_id = o.object_id)), 2)
+    ) AS Version
+  FROM sys.objects o
+  WHERE o.type = 'P'
+    AND o.name LIKE 'usp[_]KPI[_]%';
+END;
+GO
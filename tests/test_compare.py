@@ -0,0 +1,68 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from queries import compare_shift, compare_window
+
+
+def days(start, end):
+    return list(pd.date_range(start, end, freq="D"))
+
+
+def shifted(day, shift):
+    """What COMPARE_TREND_SQL's DATEADD(DAY, days, DATEADD(MONTH, months, day)) gives."""
+    months, n = shift
+    return day + pd.DateOffset(months=months) + pd.Timedelta(days=n)
+
+
+def test_no_comparison():
+    start, end = dt.date(2014, 3, 1), dt.date(2014, 3, 31)
+    assert compare_window(start, end, "No comparison") == (None, None)
+    assert compare_shift(start, end, "No comparison") == (0, 0)
+
+
+def test_previous_period_is_the_same_length_and_ends_the_day_before():
+    cs, ce = compare_window(dt.date(2014, 3, 1), dt.date(2014, 3, 31), "Previous period")
+    assert cs == dt.datetime(2014, 1, 29)
+    assert ce == dt.datetime.combine(dt.date(2014, 2, 28), dt.time.max)
+
+
+def test_last_year_clamps_29_february():
+    cs, ce = compare_window(dt.date(2016, 2, 29), dt.date(2016, 3, 31), "Same period last year")
+    assert cs == dt.datetime(2015, 2, 28)
+    assert ce == dt.datetime.combine(dt.date(2015, 3, 31), dt.time.max)
+
+
+def test_previous_period_lands_in_the_current_month():
+    # Regression: shifting by whole months put the three January days of the
+    # comparison window into March and February into April, outside the range
+    start, end = dt.date(2014, 3, 1), dt.date(2014, 3, 31)
+    cs, ce = compare_window(start, end, "Previous period")
+    shift = compare_shift(start, end, "Previous period")
+    moved = [shifted(day, shift) for day in days(cs.date(), ce.date())]
+    assert moved == days(start, end)
+
+
+@pytest.mark.parametrize("start, end", [
+    (dt.date(2014, 3, 1), dt.date(2014, 3, 31)),
+    (dt.date(2014, 3, 15), dt.date(2014, 5, 10)),
+    (dt.date(2013, 1, 1), dt.date(2016, 12, 31)),
+    (dt.date(2016, 2, 29), dt.date(2016, 3, 31)),
+])
+@pytest.mark.parametrize("mode", ["Previous period", "Same period last year"])
+def test_every_comparison_day_lands_in_a_month_of_the_range(start, end, mode):
+    # The query keeps days from the first of the start month to the end
+    cs, ce = compare_window(start, end, mode)
+    shift = compare_shift(start, end, mode)
+    moved = [shifted(day, shift) for day in days(cs.date(), ce.date())]
+    assert min(moved) >= pd.Timestamp(start.replace(day=1))
+    assert max(moved) <= pd.Timestamp(end)
+
+
+def test_last_year_keeps_each_day_in_its_calendar_month():
+    start, end = dt.date(2016, 1, 1), dt.date(2016, 12, 31)
+    cs, ce = compare_window(start, end, "Same period last year")
+    shift = compare_shift(start, end, "Same period last year")
+    for day in days(cs.date(), ce.date()):
+        assert shifted(day, shift).month == day.month
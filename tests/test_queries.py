@@ -0,0 +1,138 @@
+import datetime as dt
+import decimal
+import re
+
+import pytest
+
+from queries import kpi_batch_sql, read_result_sets
+
+
+class FakeCursor:
+    """Runs a kpi_batch_sql batch against canned result sets, the way pyodbc does.
+
+    `sets` maps a procedure to what it returns: a list of (columns, rows)
+    result sets, or None for a row count from a statement without output.
+    Each EXEC takes its own ? placeholders off the flat params, in order.
+    """
+
+    def __init__(self, sets):
+        self.sets = sets
+        self.executed = []
+        self.pending = []
+        self.description = None
+
+    def execute(self, sql, params):
+        params = list(params)
+        for statement in filter(None, (s.strip() for s in sql.split(";"))):
+            if statement.startswith("SET "):
+                continue
+            proc = statement.split()[1]
+            n = statement.count("?")
+            self.executed.append((proc, tuple(params[:n])))
+            params = params[n:]
+            self.pending.extend(self.sets.get(proc, []))
+        assert not params, "more parameters than placeholders"
+        self.nextset()
+
+    def nextset(self):
+        if not self.pending:
+            self.description = None
+            return False
+        result = self.pending.pop(0)
+        if result is None:
+            self.description, self.rows = None, []
+        else:
+            columns, self.rows = result
+            self.description = [(c, None, None, None, None, None, None) for c in columns]
+        return True
+
+    def fetchall(self):
+        return self.rows
+
+
+START, END = dt.date(2014, 1, 1), dt.date(2014, 12, 31)
+
+CALLS = {
+    "sales_vs_pur": ("dbo.usp_KPI_SalesVsPurchases", (START, END)),
+    "promo_by_group": ("dbo.usp_KPI_PromoDealsByStockGroup", ()),
+    "top_clients": ("dbo.usp_KPI_MostDiscountedClients", (10,)),
+    "imbalance": ("dbo.usp_KPI_ProductImbalance_SingleRow", (START, END, 10)),
+}
+
+SETS = {
+    "dbo.usp_KPI_SalesVsPurchases": [(["TotalSales", "TotalPurchases"], [(decimal.Decimal("12.50"), 7.0)])],
+    "dbo.usp_KPI_PromoDealsByStockGroup": [(["StockGroupName", "DealCount"], [("Toys", 3), ("Mugs", 1)])],
+    "dbo.usp_KPI_MostDiscountedClients": [(["CustomerName"], [("Tailspin",)])],
+    "dbo.usp_KPI_ProductImbalance_SingleRow": [(["StockItemName", "NetBuildUp"], [])],
+}
+
+
+def run_batch(calls, sets):
+    cursor = FakeCursor(sets)
+    sql, params = kpi_batch_sql(calls)
+    cursor.execute(sql, params)
+    return cursor, read_result_sets(cursor, list(calls))
+
+
+def test_batch_has_one_statement_per_call_after_nocount():
+    sql, _ = kpi_batch_sql(CALLS)
+    statements = [s.strip() for s in sql.split(";") if s.strip()]
+    assert statements[0] == "SET NOCOUNT ON"
+    assert [s.split()[1] for s in statements[1:]] == [proc for proc, _ in CALLS.values()]
+
+
+def test_each_call_gets_its_own_params_in_order():
+    # Calls with no parameters and with non-date ones sit between the dated
+    # calls, so any misalignment in the flat list shifts every later call
+    cursor, _ = run_batch(CALLS, SETS)
+    assert cursor.executed == list(CALLS.values())
+    assert kpi_batch_sql(CALLS)[1] == [START, END, 10, START, END, 10]
+
+
+def test_placeholders_match_params():
+    sql, params = kpi_batch_sql(CALLS)
+    assert len(re.findall(r"\?", sql)) == len(params)
+
+
+def test_result_sets_are_named_in_call_order():
+    _, frames = run_batch(CALLS, SETS)
+    assert list(frames) == list(CALLS)
+    assert frames["promo_by_group"]["StockGroupName"].tolist() == ["Toys", "Mugs"]
+    assert frames["top_clients"]["CustomerName"].tolist() == ["Tailspin"]
+
+
+def test_empty_result_set_keeps_its_columns():
+    _, frames = run_batch(CALLS, SETS)
+    assert frames["imbalance"].empty
+    assert frames["imbalance"].columns.tolist() == ["StockItemName", "NetBuildUp"]
+
+
+def test_decimals_come_back_as_floats():
+    _, frames = run_batch(CALLS, SETS)
+    assert frames["sales_vs_pur"]["TotalSales"].dtype == float
+
+
+def test_row_count_sets_are_skipped():
+    # A procedure without SET NOCOUNT ON reports the rows its INSERT touched
+    # before its SELECT, and a batch may open with one too
+    sets = dict(SETS)
+    sets["dbo.usp_KPI_SalesVsPurchases"] = [None] + SETS["dbo.usp_KPI_SalesVsPurchases"]
+    sets["dbo.usp_KPI_MostDiscountedClients"] = [None, None] + SETS["dbo.usp_KPI_MostDiscountedClients"]
+    _, frames = run_batch(CALLS, sets)
+    assert frames["sales_vs_pur"]["TotalPurchases"].tolist() == [7.0]
+    assert frames["top_clients"]["CustomerName"].tolist() == ["Tailspin"]
+    assert frames["imbalance"].columns.tolist() == ["StockItemName", "NetBuildUp"]
+
+
+def test_batch_ending_early_raises():
+    sets = {proc: result for proc, result in SETS.items()
+            if proc != "dbo.usp_KPI_ProductImbalance_SingleRow"}
+    with pytest.raises(RuntimeError, match="'imbalance'"):
+        run_batch(CALLS, sets)
+
+
+def test_batch_ending_on_a_row_count_raises():
+    sets = dict(SETS)
+    sets["dbo.usp_KPI_ProductImbalance_SingleRow"] = [None]
+    with pytest.raises(RuntimeError, match="'imbalance'"):
+        run_batch(CALLS, sets)